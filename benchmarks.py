@@ -0,0 +1,1061 @@
+# headless timings, run with: python benchmarks.py [name ...]
+# or the full suite: python benchmarks.py --suite [--json out.json]
+
+import os
+import sys
+import time
+import tracemalloc
+import json
+import argparse
+import platform
+import functools
+import subprocess
+import itertools
+import copy
+import numpy as np
+
+import core.polygons
+import core._types
+
+from core._types import SimpleConvexPolygon, Line, LineSegment, Circle
+from core._types import transform_many
+from core.polygons import SimpleConvexPolygonCollisions, pack_polygons, pair_indices
+from core.gjk import SimplexCache
+from core.dispatch import dispatcher
+from core.contacts import ContactBuffer, ContactCache
+from core.lines import LineCollisions, SegmentBatch, sweep_intersections
+from core.circles import CircleCollisions
+from core.queries import bodies_at_many
+from core.ccd import impacts
+from core.parallel import ParallelNarrowPhase
+from core.profiling import profiled
+from core.world import World
+from core.scenefile import write_scene, MappedScene
+from core.store import PolygonStore
+from core.auxiliary import project, convex_hull
+from core.broadphase import SpatialHashGrid, DynamicAABBTree, SweepAndPrune
+from core.scenes import (
+    random_polygons,
+    uneven_polygons,
+    random_segments,
+    random_lines,
+    random_circles,
+    mixed_scene,
+    scene_rng,
+)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def narrow_phase(pairs):
+    hits = 0
+    for p1, p2 in pairs:
+        if SimpleConvexPolygonCollisions.polygon_polygon_SAT(p1, p2):
+            hits += 1
+    return hits
+
+
+def grid_step(polygons, cell_size):
+    grid = SpatialHashGrid(cell_size)
+    for poly in polygons:
+        grid.insert(poly)
+    pairs = list(grid.candidate_pairs())
+    return len(pairs), narrow_phase(pairs)
+
+
+def broad_phase_frames(index, polygons, frames, rng):
+    for poly in polygons:
+        index.insert(poly)
+    n_pairs = 0
+    for _ in range(frames):
+        for poly in polygons:
+            index.translate(poly, rng.normal(size=2))
+        n_pairs += sum(1 for _ in index.candidate_pairs())
+    return n_pairs
+
+
+def bench_broad_phase(ns=(50, 100, 200, 400, 800)):
+    print("n      all-pairs  grid-pairs  hits  combinations(s)  grid(s)")
+    for n in ns:
+        rng = np.random.default_rng(n)
+        # keep the density constant so larger scenes are not just more crowded
+        polygons = random_polygons(n, extent=40 * n**0.5, rng=rng)
+        t_all, hits = timed(narrow_phase, itertools.combinations(polygons, 2))
+        t_grid, (n_pairs, grid_hits) = timed(grid_step, polygons, 50.0)
+        assert hits == grid_hits
+        print(
+            f"{n:<6} {n * (n - 1) // 2:<10} {n_pairs:<11} {hits:<5} "
+            f"{t_all:<16.4f} {t_grid:.4f}"
+        )
+
+
+def bench_uneven_sizes(ns=(200, 400, 800), frames=10):
+    print("n      grid-pairs  tree-pairs  grid(s)  tree(s)")
+    for n in ns:
+        extent = 20 * n**0.5
+        polygons = uneven_polygons(n, extent, np.random.default_rng(n))
+        # the grid has to be sized for the large bodies
+        t_grid, grid_pairs = timed(
+            broad_phase_frames,
+            SpatialHashGrid(100.0),
+            polygons,
+            frames,
+            np.random.default_rng(0),
+        )
+        polygons = uneven_polygons(n, extent, np.random.default_rng(n))
+        t_tree, tree_pairs = timed(
+            broad_phase_frames,
+            DynamicAABBTree(margin=2.0),
+            polygons,
+            frames,
+            np.random.default_rng(0),
+        )
+        print(
+            f"{n:<6} {grid_pairs // frames:<11} {tree_pairs // frames:<11} "
+            f"{t_grid:<8.3f} {t_tree:.3f}"
+        )
+
+
+def coherent_frames(index, polygons, frames, rng):
+    # bodies jitter a little every frame, only the index work is timed
+    for poly in polygons:
+        index.insert(poly)
+    elapsed = 0.0
+    for _ in range(frames):
+        for poly in polygons:
+            poly.translate(rng.normal(size=2) * 0.5)
+        start = time.perf_counter()
+        for poly in polygons:
+            index.update(poly)
+        pairs = list(index.candidate_pairs())
+        elapsed += time.perf_counter() - start
+    return elapsed / frames, len(pairs)
+
+
+def bench_coherence(ns=(200, 800, 2000), frames=10):
+    print("n      pairs  grid(ms)  tree(ms)  sap(ms)")
+    for n in ns:
+        timings = []
+        for index in (SpatialHashGrid(50.0), DynamicAABBTree(2.0), SweepAndPrune()):
+            polygons = random_polygons(n, 40 * n**0.5, np.random.default_rng(n))
+            per_frame, n_pairs = coherent_frames(
+                index, polygons, frames, np.random.default_rng(0)
+            )
+            timings.append(per_frame * 1000)
+        print(f"{n:<6} {n_pairs:<6} " + "  ".join(f"{t:<8.2f}" for t in timings))
+
+
+def bench_sat_batch(ns=(100, 200, 400)):
+    print("n      pairs    hits   scalar(s)  batch(s)")
+    for n in ns:
+        polygons = random_polygons(n, 10 * n**0.5, np.random.default_rng(n))
+        pairs = list(itertools.combinations(polygons, 2))
+        t_scalar, hits = timed(narrow_phase, pairs)
+        t_batch, (batch_hits, _, _) = timed(
+            SimpleConvexPolygonCollisions.polygon_polygon_SAT_batch, pairs
+        )
+        assert hits == batch_hits.sum()
+        print(f"{n:<6} {len(pairs):<8} {hits:<6} {t_scalar:<10.3f} {t_batch:.3f}")
+
+
+def move_polygons(polygons, steps, rng):
+    for _ in range(steps):
+        for poly in polygons:
+            poly.translate(rng.normal(size=2))
+            poly.rotate(0.01, poly.center)
+            poly.vertices, poly.axes
+
+
+def move_polygons_batch(polygons, steps, rng):
+    for _ in range(steps):
+        translations = rng.normal(size=(len(polygons), 2))
+        transform_many(polygons, translations, 0.01)
+
+
+def bench_transform(ns=(1000, 5000), steps=10):
+    # includes rebuilding the world vertices and axes the narrow phase reads
+    print("n      moves   per body(s)  batch(s)  per move(us)  batch(us)")
+    for n in ns:
+        polygons = random_polygons(n, 40 * n**0.5, np.random.default_rng(n))
+        elapsed, _ = timed(move_polygons, polygons, steps, np.random.default_rng(0))
+        polygons = random_polygons(n, 40 * n**0.5, np.random.default_rng(n))
+        t_batch, _ = timed(
+            move_polygons_batch, polygons, steps, np.random.default_rng(0)
+        )
+        moves = n * steps
+        print(
+            f"{n:<6} {moves:<7} {elapsed:<12.3f} {t_batch:<9.3f} "
+            f"{elapsed / moves * 1e6:<13.2f} {t_batch / moves * 1e6:.2f}"
+        )
+
+
+def coherent_pair_queries(func, n, frames, **kwargs):
+    # two n-gons orbiting each other in small steps, in and out of contact
+    poly1 = SimpleConvexPolygon.generate_n_polygon(n, 50.0)
+    poly2 = SimpleConvexPolygon.generate_n_polygon(n, 50.0, (60.0, 0.0))
+    hits = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        poly2.rotate(0.02, (0.0, 0.0))
+        poly2.rotate(0.05, poly2.center)
+        poly1.translate((0.0, 0.3))
+        hits += bool(func(poly1, poly2, **kwargs))
+    return (time.perf_counter() - start) / frames, hits
+
+
+def bench_gjk(sides=(3, 6, 10, 20, 40), frames=300):
+    print("sides  sat(us)  gjk cold(us)  gjk warm(us)")
+    SAT = SimpleConvexPolygonCollisions.polygon_polygon_SAT
+    GJK = SimpleConvexPolygonCollisions.polygon_polygon_GJK
+    for n in sides:
+        t_sat, sat_hits = coherent_pair_queries(SAT, n, frames)
+        t_cold, cold_hits = coherent_pair_queries(GJK, n, frames, cache=None)
+        t_warm, warm_hits = coherent_pair_queries(GJK, n, frames, cache=SimplexCache())
+        assert sat_hits == cold_hits == warm_hits
+        print(f"{n:<6} {t_sat * 1e6:<8.1f} {t_cold * 1e6:<13.1f} {t_warm * 1e6:.1f}")
+
+
+def per_pair_dispatch(pairs):
+    return [dispatcher.collide(s1, s2) for s1, s2 in pairs]
+
+
+def bench_dispatch(ns=(200, 800, 2000)):
+    print("n      pairs   hits   per pair(s)  grouped(s)")
+    for n in ns:
+        scene = mixed_scene(n, np.random.default_rng(n))
+        grid = SpatialHashGrid(50.0)
+        for s in scene:
+            grid.insert(s)
+        pairs = list(grid.candidate_pairs())
+        t_single, single = timed(per_pair_dispatch, pairs)
+        t_grouped, grouped = timed(dispatcher.collide_pairs, pairs)
+        hits = sum(map(bool, grouped))
+        assert hits == sum(map(bool, single))
+        # (polygon, circle) pairs only match the circle first registration,
+        # the swapped group still goes through its batch kernel
+        polygons = [s for s in scene if type(s) is SimpleConvexPolygon][:50]
+        circles = random_circles(len(polygons), 40 * n**0.5, np.random.default_rng(n))
+        with profiled() as stats:
+            dispatcher.collide_pairs(list(zip(polygons, circles)))
+        assert set(stats.timers) == {"narrow_phase", "circle_polygon_many"}
+        print(f"{n:<6} {len(pairs):<7} {hits:<6} {t_single:<12.3f} {t_grouped:.3f}")
+
+
+def bench_contacts(ns=(200, 400), frames=5):
+    print("n      hits   collisions(ms)  buffer(ms)")
+    for n in ns:
+        polygons = random_polygons(n, 10 * n**0.5, np.random.default_rng(n))
+        pairs = list(itertools.combinations(polygons, 2))
+        many = SimpleConvexPolygonCollisions.polygon_polygon_SAT_many
+        batch = SimpleConvexPolygonCollisions.polygon_polygon_SAT_batch
+        t_objects, collisions = timed(many, pairs)
+        buffer = ContactBuffer()
+        start = time.perf_counter()
+        for _ in range(frames):
+            buffer.reset()
+            batch(pairs, buffer)
+        t_buffer = (time.perf_counter() - start) / frames
+        assert len(buffer) == sum(map(bool, collisions))
+        print(f"{n:<6} {len(buffer):<6} {t_objects * 1e3:<15.1f} {t_buffer * 1e3:.1f}")
+
+
+def scalar_segment_hits(segments):
+    hits = 0
+    for ls1, ls2 in itertools.combinations(segments, 2):
+        hits += bool(LineCollisions.segment_segment(ls1, ls2))
+    return hits
+
+
+def scalar_raycast(polygons, origins, directions, max_t):
+    # one Python call per ray and edge, what the batch raycast replaces
+    hits = 0
+    for origin, direction in zip(origins, directions):
+        ray = LineSegment(origin, origin + direction * max_t)
+        hits += any(
+            LineCollisions.segment_segment(ray, ls)
+            for poly in polygons
+            for ls in poly.segments
+        )
+    return hits
+
+
+def bench_segments(ns=(100, 300), rays=200):
+    print("n      hits   scalar(s)  batch(s)   rays  scalar rays(s)  raycast(s)")
+    for n in ns:
+        rng = np.random.default_rng(n)
+        segments = random_segments(n, 10 * n**0.5, rng)
+        t_scalar, hits = timed(scalar_segment_hits, segments)
+        batch = SegmentBatch.from_segments(segments)
+        t_batch, (mask, *_) = timed(LineCollisions.segment_segment_batch, batch, batch)
+        assert hits == np.triu(mask, 1).sum()
+
+        polygons = random_polygons(n, 40 * n**0.5, rng)
+        origins = rng.random((rays, 2)) * 40 * n**0.5
+        directions = rng.normal(size=(rays, 2))
+        t_rays, ray_hits = timed(scalar_raycast, polygons, origins, directions, 50.0)
+        edges = SegmentBatch.from_polygons(polygons)
+        t_cast, (_, _, index) = timed(
+            LineCollisions.raycast_many, edges, origins, directions, 50.0
+        )
+        assert ray_hits == (index >= 0).sum()
+        print(
+            f"{n:<6} {hits:<6} {t_scalar:<10.3f} {t_batch:<10.4f} {rays:<5} "
+            f"{t_rays:<15.3f} {t_cast:.4f}"
+        )
+
+
+def degenerate_segments(n, rng):
+    # integer endpoints on a small grid: shared endpoints, collinear overlaps,
+    # vertical and horizontal segments
+    p1 = rng.integers(0, 12, (n, 2)).astype(float)
+    p2 = rng.integers(0, 12, (n, 2)).astype(float)
+    p2[: n // 4, 0] = p1[: n // 4, 0]
+    p2[n // 4 : n // 2, 1] = p1[n // 4 : n // 2, 1]
+    keep = (p1 != p2).any(axis=1)
+    return SegmentBatch(p1[keep], p1[keep] + (p2 - p1)[keep])
+
+
+def road_segments(n, rng):
+    # edges from random float nodes to one of their nearest neighbours, so
+    # several segments meet at every node and a few cross each other
+    nodes = rng.uniform(0, 10 * n**0.5, (n // 3 + 5, 2))
+    gaps = np.hypot(*(nodes[:, None] - nodes[None]).transpose(2, 0, 1))
+    nearest = np.argsort(gaps, axis=1)[:, 1:5]
+    starts = rng.integers(0, len(nodes), n)
+    ends = nearest[starts, rng.integers(0, 4, n)]
+    return SegmentBatch(nodes[starts], nodes[ends])
+
+
+def sweep_matches_brute(batch):
+    mask = LineCollisions.segment_segment_batch(batch, batch)[0]
+    expected = set(zip(*np.nonzero(np.triu(mask, 1))))
+    pairs, _ = sweep_intersections(batch.p1, batch.p2)
+    found, _ = LineCollisions.all_intersections(batch)
+    swept = set(map(tuple, pairs.tolist()))
+    return expected == swept == set(map(tuple, found.tolist()))
+
+
+def peak_memory(func, *args):
+    # seconds untraced, then peak MB allocated by a traced rerun since tracing
+    # slows the python heavy sweep far more than the numpy heavy dense path
+    elapsed, _ = timed(func, *args)
+    tracemalloc.start()
+    try:
+        func(*args)
+        return elapsed, tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def bench_sweep(ns=(250, 500, 1000, 2000, 4000)):
+    # the dense path tests every pair a block of rows at a time, the sweep
+    # is output sensitive. SWEEP_SEGMENTS sits where the sweep starts to win
+    # on road graphs, the dense path's memory stays bounded by DENSE_CHUNK
+    dense = LineCollisions._all_intersections_dense
+    print("scene   n      hits    dense(s)  dense(MB)  sweep(s)  sweep(MB)")
+    for n in ns:
+        rng = np.random.default_rng(n)
+        scenes = {
+            "random": SegmentBatch.from_segments(random_segments(n, 10 * n**0.5, rng)),
+            "roads": road_segments(n, rng),
+        }
+        for name, batch in scenes.items():
+            t_dense, m_dense = peak_memory(dense, batch)
+            t_sweep, m_sweep = peak_memory(sweep_intersections, batch.p1, batch.p2)
+            hits = len(dense(batch)[0])
+            assert sweep_matches_brute(batch)
+            print(
+                f"{name:<7} {n:<6} {hits:<7} {t_dense:<9.4f} {m_dense:<10.1f} "
+                f"{t_sweep:<9.4f} {m_sweep:.1f}"
+            )
+        assert sweep_matches_brute(degenerate_segments(n, rng))
+
+
+def bench_circles(ns=(50, 100, 200)):
+    # all pairs, so nearly every pair is a miss left to the bounding circles
+    print("n      pairs   hits   scalar(s)  many(s)")
+    for n in ns:
+        rng = np.random.default_rng(n)
+        extent = 40 * n**0.5
+        pairs = list(
+            itertools.product(
+                random_circles(n, extent, rng), random_polygons(n, extent, rng)
+            )
+        )
+        t_scalar, scalar = timed(
+            lambda: [CircleCollisions.circle_polygon(*pair) for pair in pairs]
+        )
+        t_many, many = timed(CircleCollisions.circle_polygon_many, pairs)
+        hits = sum(map(bool, scalar))
+        assert hits == sum(map(bool, many))
+        # the dispatcher mirrors (polygon, circle) pairs, normals from b1 to b2
+        mirrored = dispatcher.collide_pairs([pair[::-1] for pair in pairs])
+        for direct, mirror in zip(scalar, mirrored):
+            assert bool(direct) == bool(mirror)
+            if direct:
+                assert np.allclose(direct.normal, -mirror.normal)
+                vector = mirror.penetration_vector
+                assert np.allclose(direct.penetration_vector, -vector)
+                assert mirror.normal.dot(vector) > 0
+        print(f"{n:<6} {len(pairs):<7} {hits:<6} {t_scalar:<10.3f} {t_many:.3f}")
+
+
+def scalar_point_scan(polygons, points):
+    # the old way, every point against every polygon side by side
+    found = []
+    for point in points:
+        for poly in polygons:
+            inside = True
+            for i, (i1, _) in enumerate(poly.side_indices):
+                if (point - poly.vertices[i1]).dot(poly.normals[i]) > 0:
+                    inside = False
+                    break
+            if inside:
+                found.append(poly)
+    return len(found)
+
+
+def assert_boundary_points(poly, rng, step=1e-7):
+    # vertices count as inside, points on a side flip exactly when they
+    # cross it. points right on a side are left to rounding
+    wedge = SimpleConvexPolygonCollisions.polygon_points_wedge
+    ring = poly.vertices[poly.ring]
+    assert wedge(poly, ring).all()
+    assert all(SimpleConvexPolygonCollisions.polygon_point(poly, p) for p in ring)
+    following = np.roll(ring, -1, axis=0)
+    on_side = ring + rng.random((len(ring), 1)) * (following - ring)
+    dx, dy = (following - ring).T
+    outward = np.stack((dy, -dx), axis=1) / np.hypot(dx, dy)[:, None]
+    assert wedge(poly, on_side - step * outward).all()
+    assert not wedge(poly, on_side + step * outward).any()
+
+
+def bench_points(sides=(6, 32, 128, 512), m=2000, n=200, queries=200):
+    print("sides  points  dense(s)   wedge(s)")
+    rng = np.random.default_rng(14)
+    for k in sides:
+        poly = SimpleConvexPolygon.generate_n_polygon(k, 10.0)
+        points = rng.uniform(-12, 12, (m, 2))
+        starts = poly.vertices[[i1 for i1, _ in poly.side_indices]]
+        offsets = np.einsum("ij,ij->i", starts, poly.normals)
+        t_dense, dense = timed(
+            lambda: (project(points, poly.normals) <= offsets).all(axis=1)
+        )
+        t_wedge, wedge = timed(
+            SimpleConvexPolygonCollisions.polygon_points_wedge, poly, points
+        )
+        # points off the boundary get the same answer from both
+        clear = np.abs((project(points, poly.normals) - offsets).max(axis=1)) > 1e-6
+        assert (dense == wedge)[clear].all()
+        assert_boundary_points(poly, rng)
+        print(f"{k:<6} {m:<7} {t_dense:<10.5f} {t_wedge:.5f}")
+
+    print("bodies queries  scan(s)    index(s)")
+    extent = 40 * n**0.5
+    polygons = random_polygons(n, extent, rng)
+    points = rng.random((queries, 2)) * extent
+    index = DynamicAABBTree()
+    for poly in polygons:
+        index.insert(poly)
+    t_scan, scanned = timed(scalar_point_scan, polygons, points)
+    t_index, found = timed(bodies_at_many, index, points)
+    assert scanned == sum(map(len, found))
+    print(f"{n:<6} {queries:<8} {t_scan:<10.4f} {t_index:.4f}")
+
+
+def bullet_scene(n, rng):
+    # thin walls and fast small bodies that cross one within a step
+    walls = [
+        SimpleConvexPolygon(
+            [(x, -50), (x + 1, -50), (x + 1, 50), (x, 50)],
+            [(0, 1), (1, 2), (2, 3), (3, 0)],
+        )
+        for x in range(0, 100 * n, 100)
+    ]
+    bullets = []
+    for k in range(n):
+        start = (100 * k - 50, rng.uniform(-45, 45))
+        if k % 2:
+            bullets.append(Circle(start, 2.0))
+        else:
+            bullets.append(SimpleConvexPolygon.generate_n_polygon(4, 2.0, start))
+    return walls, bullets
+
+
+def substepped_hits(walls, bullets, motion, substeps):
+    hits = set()
+    for step in range(1, substeps + 1):
+        offset = motion * step / substeps
+        for k, bullet in enumerate(bullets):
+            moved = copy.copy(bullet)
+            moved.translate(offset)
+            for wall in walls:
+                if dispatcher.collide(moved, wall):
+                    hits.add(k)
+    return len(hits)
+
+
+def bench_ccd(n=50, substeps=(1, 4, 16)):
+    rng = np.random.default_rng(15)
+    walls, bullets = bullet_scene(n, rng)
+    motion = np.array((100.0, 0.0))
+    index = DynamicAABBTree()
+    for body in walls + bullets:
+        index.insert(body)
+    print("method        hits  time(s)")
+    for k in substeps:
+        t, hits = timed(substepped_hits, walls, bullets, motion, k)
+        print(f"substeps={k:<4} {hits:<5} {t:.4f}")
+    motions = {bullet: motion for bullet in bullets}
+    t, found = timed(impacts, index, motions)
+    hit_bullets = {b1 for b1, _, _ in found}
+    assert len(hit_bullets) == n
+    print(f"{'ccd':<13} {len(hit_bullets):<5} {t:.4f}")
+
+
+def bench_parallel(n=600, workers=(1, 2, 4, 8), frames=3):
+    # all pairs of n polygons, the pools are warmed up before timing
+    rng = np.random.default_rng(16)
+    polygons = random_polygons(n, 40 * n**0.5, rng)
+    pairs = list(itertools.combinations(polygons, 2))
+    serial = SimpleConvexPolygonCollisions.polygon_polygon_SAT_batch
+
+    def run(func):
+        for _ in range(frames):
+            result = func(pairs)
+        return result
+
+    t_serial, expected = timed(run, serial)
+    print(f"pairs={len(pairs)} serial {t_serial / frames:.4f}s per frame")
+    print("workers  processes(s)  speedup  threads(s)  speedup")
+    for k in workers:
+        row = []
+        for threads in (False, True):
+            with ParallelNarrowPhase(k, threads=threads) as parallel:
+                parallel.polygon_polygon_SAT_batch(pairs[:k])
+                t, result = timed(run, parallel.polygon_polygon_SAT_batch)
+            assert all(np.array_equal(a, b) for a, b in zip(expected, result))
+            row.append(t / frames)
+        t_procs, t_threads = row
+        print(
+            f"{k:<8} {t_procs:<13.4f} {t_serial / frames / t_procs:<8.2f} "
+            f"{t_threads:<11.4f} {t_serial / frames / t_threads:.2f}"
+        )
+
+
+def bench_profiling(n=2000):
+    # the same frame with the profiler off and on, then what it collected
+    rng = np.random.default_rng(18)
+    scene = mixed_scene(n, rng)
+    grid = SpatialHashGrid(50.0)
+    for body in scene:
+        grid.insert(body)
+    t_off, _ = timed(dispatcher.collide_pairs, grid.candidate_pairs())
+    with profiled() as stats:
+        t_on, _ = timed(dispatcher.collide_pairs, grid.candidate_pairs())
+    print(f"disabled {t_off:.4f}s  enabled {t_on:.4f}s")
+    snapshot = stats.snapshot()
+    for name, value in sorted(snapshot["counters"].items()):
+        print(f"  {name:<34} {value}")
+    for name, seconds in sorted(snapshot["timers"].items()):
+        print(f"  {name:<34} {seconds * 1000:.2f} ms")
+
+
+# the suite times every collision routine on n inputs, see SUITE_SIZES.
+# setups take (n, rng) and return a callable doing n calls or n items of work
+
+
+def polygon_pairs(n, rng, extent=60.0):
+    # crowded enough that a good share of the pairs overlap
+    return list(zip(random_polygons(n, extent, rng), random_polygons(n, extent, rng)))
+
+
+def segment_pairs(n, rng, extent=60.0):
+    return list(zip(random_segments(n, extent, rng), random_segments(n, extent, rng)))
+
+
+def line_pairs(n, rng, extent=60.0):
+    return list(zip(random_lines(n, extent, rng), random_lines(n, extent, rng)))
+
+
+def calls(func, args):
+    # args may be a zip, every repeat needs all of them again
+    args = list(args)
+    return lambda: [func(*a) for a in args]
+
+
+def setup_segment_point(n, rng):
+    segments = random_segments(n, 60.0, rng)
+    # half of the points lie on their segment
+    points = [
+        ls.p1 + (0.5 * ls.segment if k % 2 else rng.random(2))
+        for k, ls in enumerate(segments)
+    ]
+    return calls(LineCollisions.segment_point, zip(segments, points))
+
+
+def setup_segment_segment_batch(n, rng):
+    m = max(int(n**0.5), 1)
+    batch = SegmentBatch.from_segments(random_segments(m, 60.0, rng))
+    return lambda: LineCollisions.segment_segment_batch(batch, batch)
+
+
+def setup_segment_segment_pairs(n, rng):
+    pairs = segment_pairs(n, rng)
+    batch1 = SegmentBatch.from_segments([ls1 for ls1, _ in pairs])
+    batch2 = SegmentBatch.from_segments([ls2 for _, ls2 in pairs])
+    return lambda: LineCollisions.segment_segment_pairs(batch1, batch2)
+
+
+def ray_scene(n, rng):
+    edges = SegmentBatch.from_polygons(random_polygons(4, 60.0, rng))
+    origins = rng.random((n, 2)) * 60.0
+    directions = rng.normal(size=(n, 2))
+    return edges, origins, directions
+
+
+def setup_raycast_many(n, rng):
+    edges, origins, directions = ray_scene(n, rng)
+    return lambda: LineCollisions.raycast_many(edges, origins, directions, 50.0)
+
+
+def setup_raycast(n, rng):
+    edges, origins, directions = ray_scene(n, rng)
+    rays = [(edges, o, d, 50.0) for o, d in zip(origins, directions)]
+    return calls(LineCollisions.raycast, rays)
+
+
+def setup_all_intersections(n, rng):
+    batch = SegmentBatch.from_segments(random_segments(n, 10 * n**0.5, rng))
+    return lambda: LineCollisions.all_intersections(batch)
+
+
+def setup_polygon_points(sides):
+    def setup(n, rng):
+        poly = SimpleConvexPolygon.generate_n_polygon(sides, 10.0)
+        points = rng.uniform(-12, 12, (n, 2))
+        if sides >= 32:
+            func = SimpleConvexPolygonCollisions.polygon_points_wedge
+        else:
+            func = SimpleConvexPolygonCollisions.polygon_points
+        return lambda: func(poly, points)
+
+    return setup
+
+
+def setup_SAT_batch(n, rng):
+    pairs = polygon_pairs(n, rng)
+    polygons, idx = pair_indices(pairs)
+    pack = pack_polygons(polygons)
+    return lambda: SimpleConvexPolygonCollisions.SAT_batch(pack, idx[:, 0], idx[:, 1])
+
+
+def world_step(index, n, rng):
+    # one frame of a World: move every body, then step
+    world = World(index)
+    world.extend(mixed_scene(n, rng))
+    motions = rng.normal(size=(len(world), 2))
+
+    def step():
+        world.move_many(list(world), motions)
+        return world.step()
+
+    return step
+
+
+def bench_world(ns=(100, 1000, 5000), frames=5):
+    print("n      contacts  step(ms)  steps/s")
+    for n in ns:
+        step = world_step(DynamicAABBTree(2.0), n, np.random.default_rng(n))
+        elapsed = 0.0
+        for _ in range(frames):
+            t, contacts = timed(step)
+            elapsed += t
+        per_step = elapsed / frames
+        print(f"{n:<6} {len(contacts):<9} {per_step * 1000:<9.2f} {1 / per_step:.1f}")
+
+
+def per_call(func, args, repeats=3):
+    best = min(timed(lambda: [func(*a) for a in args])[0] for _ in range(repeats))
+    return best / max(len(args), 1)
+
+
+def bench_crossover(sides=(3, 4, 6, 8, 10, 12, 16, 24, 32, 64, 256), m=2000):
+    # single tests on floats against numpy per polygon size, the first size
+    # where numpy wins is where SCALAR_POINT_SIDES and SCALAR_SIDES belong
+    rng = np.random.default_rng(22)
+    defaults = core.polygons.SCALAR_POINT_SIDES, core.polygons.SCALAR_SIDES
+    print("sides  point float(us)  numpy(us)  SAT float(us)  numpy(us)")
+    for n in sides:
+        polygons = random_polygons(m, 60.0, rng, sides=(n, n + 1))
+        others = random_polygons(m, 60.0, rng, sides=(n, n + 1))
+        points = list(rng.random((m, 2)) * 60.0)
+        # near misses, hits add the same SAT_details to both sides and the
+        # bounding circles reject everything farther
+        near = [
+            (p1, p2)
+            for p1, p2 in zip(polygons, others)
+            if np.hypot(*(p2.position - p1.position)) <= p1.radius + p2.radius
+            and not SimpleConvexPolygonCollisions.polygon_polygon_SAT(p1, p2)
+        ]
+        times = []
+        for threshold in (n + 1, 0):
+            core.polygons.SCALAR_POINT_SIDES = threshold
+            core.polygons.SCALAR_SIDES = threshold
+            times.append(
+                (
+                    per_call(
+                        SimpleConvexPolygonCollisions.polygon_point,
+                        list(zip(polygons, points)),
+                    ),
+                    per_call(SimpleConvexPolygonCollisions.polygon_polygon_SAT, near),
+                )
+            )
+        core.polygons.SCALAR_POINT_SIDES, core.polygons.SCALAR_SIDES = defaults
+        (point_f, sat_f), (point_np, sat_np) = times
+        print(
+            f"{n:<6} {point_f * 1e6:<16.2f} {point_np * 1e6:<10.2f} "
+            f"{sat_f * 1e6:<14.2f} {sat_np * 1e6:.2f}"
+        )
+
+
+def bench_scenefile(ns=(10000, 100000), path="bench_scene.fcs"):
+    # write once, then open and query the mapped file without any objects
+    print("n       write(s)  MB      open(ms)  query(ms)  point(ms)  pairs+SAT(s)")
+    for n in ns:
+        rng = np.random.default_rng(23)
+        polygons = random_polygons(n, 40 * n**0.5, rng)
+        t_write, _ = timed(write_scene, path, polygons)
+        del polygons
+        t_open, scene = timed(MappedScene, path)
+        extent = 40 * n**0.5
+        box = (0.4 * extent, 0.4 * extent, 0.6 * extent, 0.6 * extent)
+        t_query, _ = timed(scene.query, box)
+        t_point, _ = timed(scene.bodies_at, (0.5 * extent, 0.5 * extent))
+        t_pairs, _ = timed(lambda: scene.collide(*scene.candidate_pairs()))
+        size = os.path.getsize(path) / 2**20
+        scene.close()
+        os.remove(path)
+        print(
+            f"{n:<7} {t_write:<9.2f} {size:<7.1f} {t_open * 1000:<9.3f} "
+            f"{t_query * 1000:<10.2f} {t_point * 1000:<10.2f} {t_pairs:.2f}"
+        )
+
+
+def bench_store(ns=(10000, 100000), frames=3):
+    # one frame moves every body and collides all pairs, objects in a World
+    # against a PolygonStore in both precisions
+    print("n       layout   MB      move(ms)  step(ms)  contacts")
+    for n in ns:
+        rng = np.random.default_rng(24)
+        polygons = random_polygons(n, 40 * n**0.5, rng)
+        motions = rng.normal(size=(frames, n, 2))
+        for dtype in (np.float64, np.float32):
+            store = PolygonStore(n, dtype)
+            handles = store.add_many(polygons)
+            moves = steps = 0.0
+            for motion in motions:
+                moves += timed(store.translate_many, handles, motion)[0]
+                t, (slots1, _, _, _) = timed(store.step)
+                steps += t
+            mb = store.nbytes / 2**20
+            print(
+                f"{n:<7} {np.dtype(dtype).name:<8} {mb:<7.1f} "
+                f"{moves / frames * 1000:<9.1f} {steps / frames * 1000:<9.1f} "
+                f"{len(slots1)}"
+            )
+        if n <= 10000:
+            world = World(SpatialHashGrid(50.0))
+            world.extend(polygons)
+            moves = steps = 0.0
+            for motion in motions:
+                moves += timed(world.move_many, polygons, motion)[0]
+                t, contacts = timed(world.step)
+                steps += t
+            print(
+                f"{n:<7} {'objects':<8} {'-':<7} {moves / frames * 1000:<9.1f} "
+                f"{steps / frames * 1000:<9.1f} {len(contacts)}"
+            )
+
+
+def bench_extremes(sides=(16, 24, 40, 64, 128, 512, 2048), m=300, hull=(10**4, 10**6)):
+    # dense scans against the ring search per polygon size, the first sizes
+    # where the search wins are where EXTREME_SIDES and PROJECTION_SIDES belong
+    rng = np.random.default_rng(25)
+    defaults = core._types.EXTREME_SIDES, core._types.PROJECTION_SIDES
+    print("sides  support scan(us)  search(us)  SAT scan(us)  search(us)")
+    for n in sides:
+        polygons = [
+            SimpleConvexPolygon.generate_n_polygon(n, 20.0, rng.random(2) * 60.0)
+            for _ in range(m)
+        ]
+        for poly in polygons:
+            poly.rotate(rng.normal(), poly.center)
+        directions = list(rng.normal(size=(m, 2)))
+        pairs = list(zip(polygons, polygons[1:]))
+        times = []
+        for threshold in (n + 1, n):
+            core._types.EXTREME_SIDES = threshold
+            core._types.PROJECTION_SIDES = threshold
+            times.append(
+                (
+                    per_call(
+                        SimpleConvexPolygon.support, list(zip(polygons, directions))
+                    ),
+                    per_call(SimpleConvexPolygonCollisions._SAT_overlaps, pairs),
+                )
+            )
+        core._types.EXTREME_SIDES, core._types.PROJECTION_SIDES = defaults
+        (support_scan, sat_scan), (support_search, sat_search) = times
+        print(
+            f"{n:<6} {support_scan * 1e6:<17.2f} {support_search * 1e6:<11.2f} "
+            f"{sat_scan * 1e6:<13.2f} {sat_search * 1e6:.2f}"
+        )
+    print("points   hull(ms)  vertices")
+    for n in hull:
+        t, indices = timed(convex_hull, rng.normal(size=(n, 2)))
+        print(f"{n:<8} {t * 1000:<9.2f} {len(indices)}")
+
+
+def settling_world(n, rng, cache=None):
+    # a crowded pile where only some of the bodies still move
+    world = World(DynamicAABBTree(2.0), contact_cache=cache)
+    world.extend(random_polygons(n, 25 * n**0.5, rng))
+    return world
+
+
+def bench_manifolds(n=1000, moving=(0.0, 0.1, 0.5, 1.0), frames=10):
+    # world steps with and without a contact cache, per share of moving bodies.
+    # the cache has room for every candidate pair, a smaller one thrashes
+    print("moving  contacts  plain(ms)  cached(ms)  speedup")
+    for share in moving:
+        times = []
+        for cache in (None, ContactCache(maxsize=20 * n)):
+            rng = np.random.default_rng(21)
+            world = settling_world(n, rng, cache)
+            bodies = list(world)[: int(share * n)]
+            world.step()
+            elapsed = 0.0
+            for _ in range(frames):
+                motions = rng.normal(scale=0.5, size=(len(bodies), 2))
+                world.move_many(bodies, motions)
+                t, contacts = timed(world.step)
+                elapsed += t
+            times.append(elapsed / frames)
+        plain, cached = times
+        print(
+            f"{share:<7} {len(contacts):<9} {plain * 1000:<10.2f} "
+            f"{cached * 1000:<11.2f} {plain / cached:.2f}x"
+        )
+
+
+def setup_SAT_cached(n, rng):
+    # resting pairs, after the first call every result comes from the cache
+    pairs = polygon_pairs(n, rng)
+    cache = ContactCache(maxsize=max(n, 1))
+    return lambda: [
+        SimpleConvexPolygonCollisions.polygon_polygon_SAT_cached(p1, p2, cache)
+        for p1, p2 in pairs
+    ]
+
+
+line_cases = {
+    "line_point": lambda n, rng: calls(
+        LineCollisions.line_point,
+        zip(random_lines(n, 60.0, rng), rng.random((n, 2)) * 60.0),
+    ),
+    "line_line": lambda n, rng: calls(LineCollisions.line_line, line_pairs(n, rng)),
+    "segment_point": setup_segment_point,
+    "segment_line": lambda n, rng: calls(
+        LineCollisions.segment_line,
+        zip(random_segments(n, 60.0, rng), random_lines(n, 60.0, rng)),
+    ),
+    "segment_segment": lambda n, rng: calls(
+        LineCollisions.segment_segment, segment_pairs(n, rng)
+    ),
+    "segment_segment_batch": setup_segment_segment_batch,
+    "segment_segment_pairs": setup_segment_segment_pairs,
+    "segment_segment_many": lambda n, rng: functools.partial(
+        LineCollisions.segment_segment_many, segment_pairs(n, rng)
+    ),
+    "raycast_many": setup_raycast_many,
+    "raycast": setup_raycast,
+    "all_intersections": setup_all_intersections,
+}
+
+polygon_cases = {
+    "polygon_point": lambda n, rng: calls(
+        SimpleConvexPolygonCollisions.polygon_point,
+        zip(random_polygons(n, 60.0, rng), rng.random((n, 2)) * 60.0),
+    ),
+    "polygon_points": setup_polygon_points(6),
+    "polygon_points_wedge": setup_polygon_points(64),
+    "polygon_line": lambda n, rng: calls(
+        SimpleConvexPolygonCollisions.polygon_line,
+        zip(random_polygons(n, 60.0, rng), random_lines(n, 60.0, rng)),
+    ),
+    "polygon_polygon_SAT": lambda n, rng: calls(
+        SimpleConvexPolygonCollisions.polygon_polygon_SAT, polygon_pairs(n, rng)
+    ),
+    "polygon_polygon_SAT_cached": setup_SAT_cached,
+    "SAT_batch": setup_SAT_batch,
+    "polygon_polygon_SAT_batch": lambda n, rng: functools.partial(
+        SimpleConvexPolygonCollisions.polygon_polygon_SAT_batch, polygon_pairs(n, rng)
+    ),
+    "polygon_polygon_SAT_many": lambda n, rng: functools.partial(
+        SimpleConvexPolygonCollisions.polygon_polygon_SAT_many, polygon_pairs(n, rng)
+    ),
+    "polygon_polygon_GJK": lambda n, rng: calls(
+        SimpleConvexPolygonCollisions.polygon_polygon_GJK, polygon_pairs(n, rng)
+    ),
+    "polygon_polygon_distance": lambda n, rng: calls(
+        SimpleConvexPolygonCollisions.polygon_polygon_distance, polygon_pairs(n, rng)
+    ),
+    "polygon_polygon_points": lambda n, rng: calls(
+        SimpleConvexPolygonCollisions.polygon_polygon_points, polygon_pairs(n, rng)
+    ),
+}
+
+world_cases = {
+    "step_grid": lambda n, rng: world_step(SpatialHashGrid(50.0), n, rng),
+    "step_tree": lambda n, rng: world_step(DynamicAABBTree(2.0), n, rng),
+}
+
+suite_cases = {
+    "LineCollisions": line_cases,
+    "SimpleConvexPolygonCollisions": polygon_cases,
+    "world": world_cases,
+}
+
+# public helpers that only run inside the timed functions
+suite_skipped = {"SAT_details", "GJK_details"}
+
+SUITE_SIZES = (10, 100, 1000, 10000, 100000)
+
+
+def untimed_functions():
+    missing = []
+    for cls in (LineCollisions, SimpleConvexPolygonCollisions):
+        for name, attr in vars(cls).items():
+            if name.startswith("_") or name in suite_skipped:
+                continue
+            if isinstance(attr, staticmethod):
+                if name not in suite_cases[cls.__name__]:
+                    missing.append(f"{cls.__name__}.{name}")
+    return missing
+
+
+def git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def run_suite(sizes=SUITE_SIZES, repeats=3):
+    missing = untimed_functions()
+    assert not missing, f"no suite case for {missing}"
+    results = []
+    print("group                          function                   n       best(s)")
+    for group, cases in suite_cases.items():
+        for name, setup in cases.items():
+            for n in sizes:
+                run = setup(n, scene_rng(n))
+                # small sizes are repeated, the best run is kept
+                best = min(timed(run)[0] for _ in range(repeats if n < 10000 else 1))
+                results.append(
+                    {
+                        "group": group,
+                        "function": name,
+                        "n": n,
+                        "seconds": best,
+                        "per_item": best / n,
+                    }
+                )
+                print(f"{group:<30} {name:<26} {n:<7} {best:.5f}")
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "sizes": list(sizes),
+        },
+        "results": results,
+    }
+
+
+def compare_suites(old, new, threshold=1.2):
+    # per function and size, new time over old time
+    before = {(r["group"], r["function"], r["n"]): r["seconds"] for r in old["results"]}
+    print(f"comparing against {old['meta'].get('commit')}")
+    for r in new["results"]:
+        key = r["group"], r["function"], r["n"]
+        if key not in before or not before[key]:
+            continue
+        ratio = r["seconds"] / before[key]
+        flag = "  slower" if ratio > threshold else ""
+        print(f"{r['group']:<30} {r['function']:<26} {r['n']:<7} {ratio:.2f}x{flag}")
+
+
+benchmarks = {
+    "broadphase": bench_broad_phase,
+    "uneven": bench_uneven_sizes,
+    "coherence": bench_coherence,
+    "sat_batch": bench_sat_batch,
+    "transform": bench_transform,
+    "gjk": bench_gjk,
+    "dispatch": bench_dispatch,
+    "contacts": bench_contacts,
+    "segments": bench_segments,
+    "sweep": bench_sweep,
+    "circles": bench_circles,
+    "points": bench_points,
+    "ccd": bench_ccd,
+    "parallel": bench_parallel,
+    "profiling": bench_profiling,
+    "world": bench_world,
+    "manifolds": bench_manifolds,
+    "crossover": bench_crossover,
+    "scenefile": bench_scenefile,
+    "store": bench_store,
+    "extremes": bench_extremes,
+}
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="headless collision benchmarks")
+    parser.add_argument("names", nargs="*", help=f"any of {', '.join(benchmarks)}")
+    parser.add_argument("--suite", action="store_true", help="time every routine")
+    parser.add_argument(
+        "--sizes", default=",".join(map(str, SUITE_SIZES)), help="suite sizes"
+    )
+    parser.add_argument("--json", help="write the suite results to this file")
+    parser.add_argument("--compare", help="suite results of an earlier run")
+    args = parser.parse_args(argv)
+
+    if args.suite:
+        sizes = tuple(int(n) for n in args.sizes.split(","))
+        report = run_suite(sizes)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=1)
+        if args.compare:
+            with open(args.compare) as f:
+                compare_suites(json.load(f), report)
+        if not args.names:
+            return
+    for name in args.names or benchmarks:
+        print(f"== {name}")
+        benchmarks[name]()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -14,4 +14,7 @@ console_handler.setLevel(logging.WARNING)
 formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 console_handler.setFormatter(formatter)
 
-logger.addHandler(console_handler)
\ No newline at end of file
+logger.addHandler(console_handler)
+
+# the headless entry point, everything else is imported from its module
+from .world import World
@@ -1,9 +1,18 @@
 from . import np
 from . import *
-from .auxiliary import normalize_vector, rotate_around
+from .auxiliary import normalize_vector, rotate_around, rotation_matrix_2d
+from .auxiliary import canonical_axes, unique_axes, project, convex_hull
 from . import math
+import weakref
+from bisect import bisect_left
 
 BASIS = [np.array((1.0, 0.0)), np.array((0.0, 1.0))]
+# from these many sides on convex polygons answer support and projection
+# queries by binary search over their ring, see benchmarks.py extremes. a
+# projection range searches for every axis at once, so the scan holds out
+# longer there
+EXTREME_SIDES = 40
+PROJECTION_SIDES = 80
 ORIGIN = np.zeros(2)
 
 class Line:
@@ -11,7 +20,9 @@ class Line:
         self.known_point = np.array(point)
         self.direction = np.array(direction)
         self.direction = normalize_vector(self.direction)
-        self.line_function = lambda k: self.known_point + k * self.direction
+
+    def line_function(self, k):
+        return self.known_point + k * self.direction
 
     def find_y(self, x):
         k = (x - self.known_point[0]) / self.direction[0]
@@ -29,6 +40,10 @@ class Line:
     def translate(self, tvec):
         self.known_point += tvec
 
+    def aabb(self):
+        # infinite lines are not bounded
+        return None
+
 
 class LineSegment(Line):
     def __init__(self, p1, p2):
@@ -46,12 +61,42 @@ class LineSegment(Line):
         n1 = np.array((nx, ny))
         return n1, -n1
 
+    def translate(self, tvec):
+        self.p1 = self.p1 + tvec
+        self.p2 = self.p2 + tvec
+        self.known_point = self.p1.copy()
+
+    def aabb(self):
+        (x1, y1), (x2, y2) = self.p1, self.p2
+        return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+    def support(self, d):
+        return self.p1 if self.p1.dot(d) >= self.p2.dot(d) else self.p2
+
 
 class Circle:
     def __init__(self, center, radius) -> None:
-        self.center = center
+        self.center = np.array(center, dtype=float)
         self.radius = radius
 
+    def translate(self, tvec):
+        self.center = self.center + tvec
+
+    def aabb(self):
+        x, y = self.center
+        r = self.radius
+        return x - r, y - r, x + r, y + r
+
+    def support(self, d):
+        return self.center + self.radius * normalize_vector(d)
+
+    def rotate(self, a, point):
+        # only the center moves, a circle looks the same at any angle
+        self.center = rotate_around(a, rp=point, p=self.center)
+
+    def __repr__(self):
+        return f"<circle at {self.center} radius={self.radius}>"
+
 
 side_names = {
     3: "triangle",
@@ -95,68 +140,433 @@ side_names = {
 }
 
 
-class SimpleConvexPolygon:
+class PolygonSegments:
+    # lazy sequence of a polygon's sides, LineSegments are only built on access
+    __slots__ = ("polygon",)
+
+    def __init__(self, polygon) -> None:
+        self.polygon = polygon
+
+    def __len__(self):
+        return self.polygon.sides
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            return [self[i] for i in range(*n.indices(len(self)))]
+        if n < 0:
+            n += len(self)
+        if not 0 <= n < len(self):
+            raise IndexError(n)
+        return LineSegment(*self.polygon.get_nth_side_points(n))
+
+    def __iter__(self):
+        for n in range(len(self)):
+            yield self[n]
+
+
+class PolygonGeometry:
+    # immutable local space shape, polygons with the same outline share one
+    __slots__ = (
+        "vertices",
+        "normals",
+        "axes",
+        "side_indices",
+        "sides",
+        "radius",
+        "ring",
+        "ring_angles",
+        "_ring_search",
+        "__weakref__",
+    )
+    # shared while some polygon still uses them, continuous radii would
+    # otherwise keep one geometry each for good
+    _regular = weakref.WeakValueDictionary()
+
     def __init__(self, points, sides) -> None:
-        self.points = list(points)
-        self.points = [np.array(p) for p in self.points]
-        self.side_indices = sides
+        self.vertices = np.array(points, dtype=float).reshape(-1, 2)
+        self.side_indices = tuple(tuple(side) for side in sides)
         self.sides = len(self.side_indices)
-        self.fetch_side = lambda t: (self.points[t[0]], self.points[t[1]])
-        self.segments = list()
-        self.outnormals = list()  # consider renaming
-        self.center = (
-            np.array([sum(p[0] for p in self.points), sum(p[1] for p in self.points)])
-            / self.sides
-        )
-        self.init_segments()
-
-    def init_segments(self):
-        for i in range(self.sides):
-            side_points = self.get_nth_side_points(i)
-            segment = LineSegment(*side_points)
-            self.segments.append(segment)
-            ctop = segment.p1 - self.center
-            n1, n2 = segment.normals
-            outnormal = n1 if n1.dot(ctop) > 0 else n2
-            self.outnormals.append(outnormal)
+        self.normals = self.find_normals()
+        # separating axes for SAT, computed once per outline
+        self.axes = unique_axes(self.normals)
+        # bounding circle around the local origin, it survives any pose
+        self.radius = float(np.hypot(*self.vertices.T).max()) if self.sides else 0.0
+        self.ring = self.find_ring()
+        self.ring_angles = self.find_ring_angles()
+        # plain python copies, a single search is cheaper on them than in numpy
+        self._ring_search = None
+        if self.ring_angles is not None:
+            self._ring_search = (
+                tuple(self.ring_angles.tolist()),
+                self.ring.tolist(),
+                self.vertices[self.ring].tolist(),
+            )
+        for array in (self.vertices, self.normals, self.axes):
+            array.flags.writeable = False
+
+    def find_normals(self):
+        indices = np.array(self.side_indices, dtype=np.intp).reshape(-1, 2)
+        p1 = self.vertices[indices[:, 0]]
+        dx, dy = (self.vertices[indices[:, 1]] - p1).T
+        normals = np.stack((-dy, dx), axis=1)
+        normals /= np.hypot(dx, dy)[:, None]
+        # flip the ones pointing towards the local origin, which is the center
+        inward = np.einsum("ij,ij->i", normals, p1) <= 0
+        normals[inward] *= -1
+        return normals
+
+    def find_ring(self):
+        # vertex indices in counter clockwise order along the sides, None if
+        # the sides don't form a single loop over every vertex
+        following = {}
+        for i1, i2 in self.side_indices:
+            following.setdefault(i1, []).append(i2)
+            following.setdefault(i2, []).append(i1)
+        if not following or any(len(n) != 2 for n in following.values()):
+            return None
+        start = self.side_indices[0][0]
+        ring, previous = [start], None
+        while True:
+            a, b = following[ring[-1]]
+            current = b if a == previous else a
+            if current == start:
+                break
+            previous = ring[-1]
+            ring.append(current)
+        if len(ring) != len(self.vertices):
+            return None
+        ring = np.array(ring, dtype=np.intp)
+        x, y = self.vertices[ring].T
+        if (x * np.roll(y, -1) - np.roll(x, -1) * y).sum() < 0:
+            ring = ring[::-1].copy()
+        ring.flags.writeable = False
+        return ring
+
+    def find_ring_angles(self):
+        # outward normal angles of the ring's sides, ascending from the first
+        # one. None unless the ring is convex, then every turn is below pi
+        # and all of them add up to one full turn
+        if self.ring is None:
+            return None
+        v = self.vertices[self.ring]
+        dx, dy = (np.roll(v, -1, axis=0) - v).T
+        angles = np.arctan2(-dx, dy)
+        turns = np.mod(np.diff(angles, append=angles[0]), 2 * math.pi)
+        if not math.isclose(turns.sum(), 2 * math.pi):
+            return None
+        angles = angles[0] + np.concatenate(((0.0,), np.cumsum(turns[:-1])))
+        angles.flags.writeable = False
+        return angles
+
+    @property
+    def convex(self):
+        return self.ring_angles is not None
+
+    def extreme(self, angles):
+        # vertex indices farthest along local directions given by angle, a
+        # binary search for the two sides whose normals enclose each one
+        first = self.ring_angles[0]
+        angles = np.mod(np.asarray(angles) - first, 2 * math.pi) + first
+        k = np.searchsorted(self.ring_angles, angles)
+        return self.ring[k % len(self.ring)]
+
+    def extreme_one(self, angle):
+        # extreme for a single direction
+        angles, ring, _ = self._ring_search
+        first = angles[0]
+        angle = (angle - first) % (2 * math.pi) + first
+        return ring[bisect_left(angles, angle) % len(ring)]
+
+    @classmethod
+    def regular(cls, n, r=1.0):
+        key = (n, float(r))
+        geometry = cls._regular.get(key)
+        if geometry is None:
+            step = 2 * math.pi / n
+            points = [(r * np.sin(i * step), r * np.cos(i * step)) for i in range(n)]
+            sides = [(i, (i + 1) % n) for i in range(n)]
+            geometry = cls._regular[key] = cls(points, sides)
+        return geometry
+
+    def __repr__(self):
+        return f"<PolygonGeometry sides={self.sides}>"
+
+
+class SimpleConvexPolygon:
+    # the outline is a shared PolygonGeometry in local space, placed by a
+    # position and an angle. world space data is derived lazily and cached
+    # until the pose changes, so moving a polygon only touches the pose
+    __slots__ = (
+        "geometry",
+        "position",
+        "angle",
+        "_vertices",
+        "_normals",
+        "_axes",
+        "_aabb",
+        "_rotation",
+    )
+
+    def __init__(self, points, sides) -> None:
+        points = np.array(points, dtype=float).reshape(-1, 2)
+        center = points.sum(axis=0) / len(sides)
+        self.set_geometry(PolygonGeometry(points - center, sides), center)
+
+    def set_geometry(self, geometry, position=(0.0, 0.0), angle=0.0):
+        self.geometry = geometry
+        self.set_pose(position, angle)
+
+    @classmethod
+    def from_geometry(cls, geometry, position=(0.0, 0.0), angle=0.0):
+        shape = object.__new__(cls)
+        shape.set_geometry(geometry, position, angle)
+        return shape
+
+    def set_pose(self, position, angle):
+        self.position = np.array(position, dtype=float)
+        self.angle = float(angle)
+        self._vertices = self._normals = self._axes = self._aabb = None
+        self._rotation = None
+
+    @property
+    def side_indices(self):
+        return self.geometry.side_indices
+
+    @property
+    def sides(self):
+        return self.geometry.sides
+
+    @property
+    def center(self):
+        return self.position
+
+    @property
+    def rotation(self):
+        # one matrix per pose, shared by vertices, normals and axes
+        if self._rotation is None:
+            self._rotation = rotation_matrix_2d(self.angle)
+        return self._rotation
+
+    @property
+    def vertices(self):
+        if self._vertices is None:
+            local = self.geometry.vertices
+            if self.angle:
+                local = local.dot(self.rotation)
+            self._vertices = local + self.position
+            self._vertices.flags.writeable = False
+        return self._vertices
+
+    @property
+    def normals(self):
+        if self._normals is None:
+            if self.angle:
+                self._normals = self.geometry.normals.dot(self.rotation)
+                self._normals.flags.writeable = False
+            else:
+                self._normals = self.geometry.normals
+        return self._normals
+
+    @property
+    def axes(self):
+        # only depends on the angle, so translating keeps the cached axes
+        if self._axes is None:
+            if self.angle:
+                rotated = self.geometry.axes.dot(self.rotation)
+                self._axes = canonical_axes(rotated)
+                self._axes.flags.writeable = False
+            else:
+                self._axes = self.geometry.axes
+        return self._axes
+
+    @property
+    def points(self):
+        return self.vertices
+
+    @property
+    def radius(self):
+        return self.geometry.radius
+
+    @property
+    def ring(self):
+        return self.geometry.ring
+
+    @property
+    def outnormals(self):  # consider renaming
+        return list(self.normals)
+
+    @property
+    def segments(self):
+        return PolygonSegments(self)
+
+    @classmethod
+    def from_points(cls, points):
+        # the convex hull of a point cloud, with its sides in ring order
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        hull = convex_hull(points)
+        if len(hull) < 3:
+            raise ValueError("the points don't enclose any area")
+        n = len(hull)
+        return cls(points[hull], [(i, (i + 1) % n) for i in range(n)])
 
     @classmethod
     def generate_n_polygon(cls, n, r=1.0, center=(0, 0)):
-        generated = object.__new__(cls)
-        step = 2 * math.pi / n
-        points = [
-            (center[0] + r * np.sin(i * step), center[1] + r * np.cos(i * step))
-            for i in range(n)
-        ]
-        sides = [(i, (i + 1) % n) for i in range(n)]
-        generated.__init__(points, sides)
-        return generated
+        return cls.from_geometry(PolygonGeometry.regular(n, r), center)
+
+    def fetch_side(self, t):
+        return self.vertices[t[0]], self.vertices[t[1]]
 
     def get_nth_side_points(self, n):
         side_indices = self.side_indices[n]
         return self.fetch_side(side_indices)
 
     def translate(self, tvec):
-        new_points = []
-        for p in self.points:
-            new_points.append(p + tvec)
-        self.__init__(new_points, self.side_indices)
+        self.position = self.position + tvec
+        self._vertices = self._aabb = None
 
     def rotate(self, a, point):
-        new_points = []
-        for p in self.points:
-            new_points.append(rotate_around(a, rp=point, p=p))
-        self.__init__(new_points, sides=self.sides)
+        # same convention as rotate_around
+        self.position = rotate_around(a, rp=point, p=self.position)
+        self.angle += a
+        self._vertices = self._normals = self._axes = self._aabb = None
+        self._rotation = None
+
+    def aabb(self):
+        if self._aabb is None:
+            vertices = self.vertices
+            minx, miny = vertices.min(axis=0).tolist()
+            maxx, maxy = vertices.max(axis=0).tolist()
+            self._aabb = minx, miny, maxx, maxy
+        return self._aabb
+
+    def support(self, d):
+        # farthest vertex along d, big convex rings find it by binary search
+        # and only transform that one vertex
+        if self.sides >= EXTREME_SIDES and self.geometry.convex:
+            x, y = d.tolist() if type(d) is np.ndarray else d
+            i = self.geometry.extreme_one(math.atan2(y, x) + self.angle)
+            if self._vertices is not None:
+                return self._vertices[i]
+            return self.geometry.vertices[i].dot(self.rotation) + self.position
+        vertices = self.vertices
+        return vertices[vertices.dot(d).argmax()]
+
+    def projection_range(self, axes):
+        # (k,) minimum and maximum projections of the vertices on k axes
+        if self.sides >= PROJECTION_SIDES and self.geometry.convex:
+            angles = np.arctan2(axes[:, 1], axes[:, 0]) + self.angle
+            vertices = self.vertices
+            upper = vertices[self.geometry.extreme(angles)]
+            lower = vertices[self.geometry.extreme(angles + math.pi)]
+            return (
+                np.einsum("ij,ij->i", lower, axes),
+                np.einsum("ij,ij->i", upper, axes),
+            )
+        projections = project(self.vertices, axes)
+        return projections.min(axis=0), projections.max(axis=0)
 
     def __repr__(self):
         return f"<{side_names[self.sides]} at {self.center}>"
 
     def __str__(self):
         return self.__repr__()
-    
+
+
+def _rotate_rows(v, c, s):
+    # row vector convention of rotation_matrix_2d, c and s broadcast per row
+    x, y = v[..., 0], v[..., 1]
+    return np.stack((x * c + y * s, y * c - x * s), axis=-1)
+
+
+def transform_many(bodies, translations=None, angles=None, points=None):
+    # translates every body and then rotates it around its point (its own
+    # center by default), like translate followed by rotate on each body.
+    # polygons are moved together: one sin and cos per angle, and their
+    # world vertices, normals and axes are rebuilt in one pass over all of
+    # them instead of lazily per body
+    bodies = list(bodies)
+    n = len(bodies)
+    translations = (
+        np.zeros((n, 2))
+        if translations is None
+        else np.broadcast_to(np.asarray(translations, dtype=float), (n, 2))
+    )
+    angles = (
+        None
+        if angles is None
+        else np.broadcast_to(np.asarray(angles, dtype=float), (n,))
+    )
+    polygons, rows = [], []
+    for k, body in enumerate(bodies):
+        # subclasses with their own translate or rotate go through them
+        cls = type(body)
+        if (
+            isinstance(body, SimpleConvexPolygon)
+            and cls.translate is SimpleConvexPolygon.translate
+            and cls.rotate is SimpleConvexPolygon.rotate
+        ):
+            polygons.append(body)
+            rows.append(k)
+            continue
+        body.translate(translations[k])
+        if angles is not None and angles[k]:
+            center = body.center if points is None else np.asarray(points)[k]
+            body.rotate(angles[k], center)
+    if not polygons:
+        return
+
+    rows = np.array(rows, dtype=np.intp)
+    positions = np.array([poly.position for poly in polygons]) + translations[rows]
+    turns = np.array([poly.angle for poly in polygons])
+    if angles is not None:
+        a = angles[rows]
+        if points is None:
+            pivots = positions
+        else:
+            pivots = np.broadcast_to(np.asarray(points, dtype=float), (n, 2))[rows]
+        positions = pivots + _rotate_rows(positions - pivots, np.cos(a), np.sin(a))
+        turns = turns + a
+
+    # every local vertex and normal next to the sin and cos of its body
+    c, s = np.cos(turns), np.sin(turns)
+    geometries = [poly.geometry for poly in polygons]
+    counts = np.array([g.sides for g in geometries], dtype=np.intp)
+    axis_counts = np.array([len(g.axes) for g in geometries], dtype=np.intp)
+    per_vertex = np.repeat(np.arange(len(polygons)), counts)
+    per_axis = np.repeat(np.arange(len(polygons)), axis_counts)
+    vertices = _rotate_rows(
+        np.concatenate([g.vertices for g in geometries]),
+        c[per_vertex],
+        s[per_vertex],
+    )
+    vertices += positions[per_vertex]
+    normals = _rotate_rows(
+        np.concatenate([g.normals for g in geometries]), c[per_vertex], s[per_vertex]
+    )
+    axes = canonical_axes(
+        _rotate_rows(
+            np.concatenate([g.axes for g in geometries]), c[per_axis], s[per_axis]
+        )
+    )
+    for array in (vertices, normals, axes):
+        array.flags.writeable = False
+
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])).tolist()
+    axis_starts = np.concatenate(([0], np.cumsum(axis_counts)[:-1])).tolist()
+    for k, poly in enumerate(polygons):
+        v, a = starts[k], axis_starts[k]
+        poly.position = positions[k]
+        poly.angle = float(turns[k])
+        poly._vertices = vertices[v : v + counts[k]]
+        poly._normals = normals[v : v + counts[k]]
+        poly._axes = axes[a : a + axis_counts[k]]
+        poly._aabb = poly._rotation = None
+
+
 class BoundingBox(SimpleConvexPolygon):
     pass
 
+
 class BoundingCircle(SimpleConvexPolygon):
     pass
 
@@ -171,6 +581,10 @@ def update_structure(structure, reinitialize=False, **kwargs):
 
 
 class Collision:
+    # fixed slots instead of a __dict__, anything else a test reports (e.g.
+    # collision_structures) stays in details and is reached through __getattr__
+    __slots__ = ("status", "point", "points", "normal", "penetration", "details")
+
     types_attributes = {
         np.ndarray: "point",
         bool: "status",
@@ -178,26 +592,90 @@ class Collision:
         dict: "details",
     }
 
-    def __init__(self, *args) -> None:
+    def __init__(
+        self,
+        *args,
+        status=None,
+        point=None,
+        points=None,
+        normal=None,
+        penetration=None,
+        details=None,
+    ) -> None:
+        self.status = status
+        self.point = point
+        self.points = points
+        self.normal = normal
+        self.penetration = penetration
+        self.details = details
+        types_attributes = __class__.types_attributes
         for arg in args:
-            t = type(arg)
-            if t not in __class__.types_attributes:
-                continue
-            self.__dict__[self.types_attributes[t]] = arg
-        if self.details:
-            self.__dict__.update(self.details)
+            attr = types_attributes.get(type(arg))
+            if attr is not None:
+                setattr(self, attr, arg)
+        details = self.details
+        if details:
+            if "point" in details:
+                self.point = details["point"]
+            if "points" in details:
+                self.points = details["points"]
+            if "normal" in details:
+                self.normal = details["normal"]
+            vector = details.get("penetration_vector")
+            if vector is not None and self.penetration is None:
+                self.penetration = float(np.hypot(*vector))
 
-    def __getattr__(self, item):
-        if item in __class__.types_attributes.values():
+    @property
+    def penetration_vector(self):
+        if self.details and "penetration_vector" in self.details:
+            return self.details["penetration_vector"]
+        if self.normal is None or self.penetration is None:
             return None
-        elif self.details and item not in self.details:
+        return self.penetration * self.normal
+
+    def mirrored(self):
+        # the same contact reported for the bodies in the other order, the
+        # normal and the penetration vector point the other way
+        if self.normal is None and not (
+            self.details and self.details.get("penetration_vector") is not None
+        ):
+            return self
+        details = dict(self.details) if self.details else None
+        if details:
+            for key in ("normal", "penetration_vector"):
+                if details.get(key) is not None:
+                    details[key] = -details[key]
+        mirror = Collision(
+            status=self.status,
+            point=self.point,
+            points=self.points,
+            penetration=self.penetration,
+            details=details,
+        )
+        if self.normal is not None:
+            mirror.normal = -self.normal
+        return mirror
+
+    def __getattr__(self, item):
+        # only reached for names that are not slots or properties
+        if item.startswith("__"):
+            raise AttributeError(item)
+        details = self.details
+        if details:
+            if item in details:
+                return details[item]
             raise AttributeError(item)
 
     def __bool__(self):
         return bool(self.status)
-    
+
     def __repr__(self):
-        return f"Collision({self.__dict__})"
-    
+        fields = {
+            attr: getattr(self, attr)
+            for attr in __class__.__slots__
+            if getattr(self, attr) is not None
+        }
+        return f"Collision({fields})"
+
     def __str__(self):
         return self.__repr__()
@@ -52,6 +52,37 @@ def are_collinear(v1, v2):
     return not cross.any()
 
 
+def canonical_axes(axes: np.ndarray):
+    # flips axes into the upper half plane so parallel ones become equal
+    flip = (axes[:, 1] < 0) | ((axes[:, 1] == 0) & (axes[:, 0] < 0))
+    return np.where(flip[:, None], -axes, axes)
+
+
+def unique_axes(normals: np.ndarray, atol=1e-12):
+    # canonical separating axes sorted by angle, parallel normals kept once
+    axes = canonical_axes(normals)
+    axes = axes[np.argsort(np.arctan2(axes[:, 1], axes[:, 0]), kind="stable")]
+    keep = np.ones(len(axes), dtype=bool)
+    cross = axes[1:, 0] * axes[:-1, 1] - axes[1:, 1] * axes[:-1, 0]
+    keep[1:] = np.abs(cross) > atol
+    # (1, 0) and (-1, 0) end up on both ends of the angle range
+    if len(axes) > 1:
+        first, last = axes[0], axes[-1]
+        if abs(first[0] * last[1] - first[1] * last[0]) <= atol:
+            keep[-1] = False
+    return axes[keep]
+
+
+def project(vertices: np.ndarray, axes: np.ndarray):
+    # (n, k) projections of every vertex on every axis
+    return vertices[:, 0, None] * axes[:, 0] + vertices[:, 1, None] * axes[:, 1]
+
+
+def cross2(a, b):
+    # z component of the cross product, works on (..., 2) arrays
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
 def normalize_vector(v: np.ndarray):
     mag = np.linalg.norm(v)
     return v / mag
@@ -64,11 +95,138 @@ def vector_projection(v1: np.ndarray, v2: np.ndarray):
 
 
 def rotation_matrix_2d(angle):
-    return np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    c, s = math.cos(angle), math.sin(angle)
+    return np.array(((c, -s), (s, c)))
 
 
 def rotate_around(angle, rp, p):
-    p -= rp
-    p = p.dot(rotation_matrix_2d(angle))
-    p += rp
-    return p
+    # returns a new array, p is left untouched
+    return (p - rp).dot(rotation_matrix_2d(angle)) + rp
+
+
+def circles_overlap(c1, r1, c2, r2):
+    # touching counts, squared distances avoid the root
+    d = c2 - c1
+    r = r1 + r2
+    return d.dot(d) <= r * r
+
+
+# axis aligned bounding boxes are (minx, miny, maxx, maxy) tuples
+
+
+def aabbs_overlap(b1, b2):
+    return not (b1[2] < b2[0] or b2[2] < b1[0] or b1[3] < b2[1] or b2[3] < b1[1])
+
+
+def cell_range(aabb, cell_size):
+    # inclusive range of grid cells covered by the box
+    minx, miny, maxx, maxy = aabb
+    return (
+        math.floor(minx / cell_size),
+        math.floor(miny / cell_size),
+        math.floor(maxx / cell_size),
+        math.floor(maxy / cell_size),
+    )
+
+
+def aabb_union(b1, b2):
+    return (
+        min(b1[0], b2[0]),
+        min(b1[1], b2[1]),
+        max(b1[2], b2[2]),
+        max(b1[3], b2[3]),
+    )
+
+
+def aabb_contains(outer, inner):
+    return (
+        outer[0] <= inner[0]
+        and outer[1] <= inner[1]
+        and inner[2] <= outer[2]
+        and inner[3] <= outer[3]
+    )
+
+
+def aabb_perimeter(b):
+    return 2 * ((b[2] - b[0]) + (b[3] - b[1]))
+
+
+def fatten_aabb(b, margin):
+    return b[0] - margin, b[1] - margin, b[2] + margin, b[3] + margin
+
+
+def ray_aabb(origin, direction, tmin, tmax, b):
+    # slab test, returns the entry parameter or None if the ray misses
+    for axis in (0, 1):
+        o, d = origin[axis], direction[axis]
+        lo, hi = b[axis], b[axis + 2]
+        if d == 0:
+            if o < lo or o > hi:
+                return None
+            continue
+        t1, t2 = (lo - o) / d, (hi - o) / d
+        if t1 > t2:
+            t1, t2 = t2, t1
+        tmin, tmax = max(tmin, t1), min(tmax, t2)
+        if tmin > tmax:
+            return None
+    return tmin
+
+
+def ragged_rows(starts, counts):
+    # flat rows of ragged ranges start:start + count, with the range each row
+    # belongs to and its position within it
+    owner = np.repeat(np.arange(len(counts)), counts)
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + local, owner, local
+
+
+def aabb_pairs(boxes):
+    # (i, j) index arrays of every pair of overlapping (N, 4) boxes, one
+    # vectorized sweep along x
+    boxes = np.asarray(boxes)
+    order = np.argsort(boxes[:, 0], kind="stable")
+    ordered = boxes[order]
+    ends = np.searchsorted(ordered[:, 0], ordered[:, 2], side="right")
+    firsts = np.arange(1, len(order) + 1)
+    counts = np.maximum(ends - firsts, 0)
+    i = np.repeat(np.arange(len(order)), counts)
+    j, _, _ = ragged_rows(firsts, counts)
+    overlap = (ordered[i, 1] <= ordered[j, 3]) & (ordered[j, 1] <= ordered[i, 3])
+    return order[i[overlap]], order[j[overlap]]
+
+
+def convex_hull(points):
+    # indices of the hull vertices in counter clockwise order, starting at
+    # the lowest leftmost point. points on the hull's sides are left out.
+    # quickhull, every split is one vectorized pass over its region
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    if not len(points):
+        return np.zeros(0, dtype=np.intp)
+    order = np.lexsort((points[:, 1], points[:, 0]))
+    lo, hi = order[0], order[-1]
+    if (points[lo] == points[hi]).all():
+        return np.array([lo], dtype=np.intp)
+    everything = np.arange(len(points))
+    hull = [lo]
+    # (a, b, candidates) takes the points right of a -> b, the lower chain
+    # runs from lo to hi and comes first
+    stack = [(hi, lo, everything), (lo, hi, everything)]
+    while stack:
+        a, b, candidates = stack.pop()
+        dx, dy = points[b] - points[a]
+        rel = points[candidates] - points[a]
+        right = rel[:, 0] * dy - rel[:, 1] * dx
+        outside = right > 0
+        if not outside.any():
+            hull.append(b)
+            continue
+        candidates, right, rel = candidates[outside], right[outside], rel[outside]
+        # of the points tied for farthest, the last one along a -> b. one in
+        # between would become a vertex without a turn
+        ties = np.flatnonzero(right == right.max())
+        farthest = candidates[ties[(rel[ties, 0] * dx + rel[ties, 1] * dy).argmax()]]
+        stack.append((farthest, b, candidates))
+        stack.append((a, farthest, candidates))
+    # the walk ends back at lo
+    return np.array(hull[:-1], dtype=np.intp)
@@ -0,0 +1,582 @@
+# broad phase structures, they only hand out candidate pairs for the narrow phase
+
+import math
+from collections import defaultdict
+from ._types import LineSegment
+from .auxiliary import (
+    cell_range,
+    aabbs_overlap,
+    aabb_contains,
+    fatten_aabb,
+    aabb_union,
+    aabb_perimeter,
+    ray_aabb,
+)
+
+
+class SpatialHashGrid:
+    def __init__(self, cell_size=100.0) -> None:
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        # body -> [insertion order, covered cell range, aabb]
+        self.entries = {}
+        # bodies without a finite extent (e.g. Line) pair with everything
+        self.unbounded = []
+        self._counter = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, body):
+        return body in self.entries
+
+    def _cells_of(self, crange):
+        x0, y0, x1, y1 = crange
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield x, y
+
+    def insert(self, body):
+        if body in self.entries:
+            return self.update(body)
+        aabb = body.aabb()
+        crange = None if aabb is None else cell_range(aabb, self.cell_size)
+        self.entries[body] = [self._counter, crange, aabb]
+        self._counter += 1
+        if crange is None:
+            self.unbounded.append(body)
+            return
+        for cell in self._cells_of(crange):
+            self.cells[cell].append(body)
+
+    def remove(self, body):
+        _, crange, _ = self.entries.pop(body)
+        if crange is None:
+            self.unbounded.remove(body)
+            return
+        for cell in self._cells_of(crange):
+            self._leave(cell, body)
+
+    def _leave(self, cell, body):
+        bucket = self.cells[cell]
+        bucket.remove(body)
+        if not bucket:
+            del self.cells[cell]
+
+    def update(self, body):
+        # moves the body between buckets, only touching the cells that changed
+        if body not in self.entries:
+            return self.insert(body)
+        entry = self.entries[body]
+        old = entry[1]
+        if old is None:
+            return
+        aabb = body.aabb()
+        entry[2] = aabb
+        new = cell_range(aabb, self.cell_size)
+        if new == old:
+            return
+        old_cells = set(self._cells_of(old))
+        new_cells = set(self._cells_of(new))
+        for cell in old_cells - new_cells:
+            self._leave(cell, body)
+        for cell in new_cells - old_cells:
+            self.cells[cell].append(body)
+        entry[1] = new
+
+    def translate(self, body, tvec):
+        body.translate(tvec)
+        self.update(body)
+
+    def rotate(self, body, a, point):
+        body.rotate(a, point)
+        self.update(body)
+
+    def _ordered(self, b1, b2):
+        if self.entries[b1][0] > self.entries[b2][0]:
+            return b2, b1
+        return b1, b2
+
+    def candidate_pairs(self):
+        entries = self.entries
+        for cell, bucket in self.cells.items():
+            cx, cy = cell
+            for i in range(len(bucket)):
+                b1 = bucket[i]
+                _, r1, box1 = entries[b1]
+                for j in range(i + 1, len(bucket)):
+                    b2 = bucket[j]
+                    _, r2, box2 = entries[b2]
+                    # a pair sharing several cells is only reported from the
+                    # lowest cell of the overlap, so no dedup set is needed
+                    if cx != max(r1[0], r2[0]) or cy != max(r1[1], r2[1]):
+                        continue
+                    if aabbs_overlap(box1, box2):
+                        yield self._ordered(b1, b2)
+        for i, b1 in enumerate(self.unbounded):
+            for b2 in self.unbounded[i + 1 :]:
+                yield self._ordered(b1, b2)
+            for b2, (_, crange, _) in entries.items():
+                if crange is not None:
+                    yield self._ordered(b1, b2)
+
+    def query(self, aabb):
+        found = set()
+        for cell in self._cells_of(cell_range(aabb, self.cell_size)):
+            found.update(self.cells.get(cell, ()))
+        found.update(self.unbounded)
+        return found
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+        self.unbounded.clear()
+
+    def __repr__(self):
+        return (
+            f"<SpatialHashGrid cell_size={self.cell_size} bodies={len(self.entries)}"
+            f" cells={len(self.cells)}>"
+        )
+
+
+class _TreeNode:
+    def __init__(self, box, body=None, fat=None) -> None:
+        self.box = box
+        self.body = body
+        # leaves keep the fattened aabb of their body as a plain tuple
+        self.fat = fat
+        self.parent = None
+        self.child1 = None
+        self.child2 = None
+        self.height = 0
+
+    @property
+    def is_leaf(self):
+        return self.child1 is None
+
+
+class DynamicAABBTree:
+    # bodies are stored with a margin around their AABB and only reinserted
+    # once they leave it, the tree is kept balanced with AVL style rotations
+    def __init__(self, margin=5.0) -> None:
+        self.margin = margin
+        self.root = None
+        # body -> [insertion order, leaf node]
+        self.entries = {}
+        self.unbounded = []
+        self._counter = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, body):
+        return body in self.entries
+
+    def insert(self, body):
+        if body in self.entries:
+            return self.update(body)
+        aabb = body.aabb()
+        if aabb is None:
+            self.entries[body] = [self._counter, None]
+            self.unbounded.append(body)
+        else:
+            fat = fatten_aabb(aabb, self.margin)
+            leaf = _TreeNode(fat, body, fat)
+            self.entries[body] = [self._counter, leaf]
+            self._insert_leaf(leaf)
+        self._counter += 1
+
+    def remove(self, body):
+        _, leaf = self.entries.pop(body)
+        if leaf is None:
+            self.unbounded.remove(body)
+        else:
+            self._remove_leaf(leaf)
+
+    def update(self, body):
+        # returns True if the body left its fat box and had to be reinserted
+        if body not in self.entries:
+            self.insert(body)
+            return True
+        leaf = self.entries[body][1]
+        if leaf is None:
+            return False
+        aabb = body.aabb()
+        if aabb_contains(leaf.fat, aabb):
+            return False
+        self._remove_leaf(leaf)
+        leaf.fat = leaf.box = fatten_aabb(aabb, self.margin)
+        self._insert_leaf(leaf)
+        return True
+
+    def translate(self, body, tvec):
+        body.translate(tvec)
+        return self.update(body)
+
+    def rotate(self, body, a, point):
+        body.rotate(a, point)
+        return self.update(body)
+
+    def _insert_leaf(self, leaf):
+        if self.root is None:
+            self.root = leaf
+            leaf.parent = None
+            return
+
+        # descend towards the cheapest sibling by the perimeter heuristic
+        box = leaf.box
+        node = self.root
+        while not node.is_leaf:
+            perimeter = aabb_perimeter(node.box)
+            combined = aabb_perimeter(aabb_union(node.box, box))
+            cost = 2 * combined
+            inheritance = 2 * (combined - perimeter)
+            cost1 = self._descend_cost(node.child1, box) + inheritance
+            cost2 = self._descend_cost(node.child2, box) + inheritance
+            if cost < cost1 and cost < cost2:
+                break
+            node = node.child1 if cost1 < cost2 else node.child2
+
+        sibling = node
+        old_parent = sibling.parent
+        new_parent = _TreeNode(aabb_union(box, sibling.box))
+        new_parent.parent = old_parent
+        new_parent.height = sibling.height + 1
+        if old_parent is None:
+            self.root = new_parent
+        elif old_parent.child1 is sibling:
+            old_parent.child1 = new_parent
+        else:
+            old_parent.child2 = new_parent
+        new_parent.child1, new_parent.child2 = sibling, leaf
+        sibling.parent = leaf.parent = new_parent
+        self._refit(leaf.parent)
+
+    @staticmethod
+    def _descend_cost(child, box):
+        union = aabb_perimeter(aabb_union(child.box, box))
+        if child.is_leaf:
+            return union
+        return union - aabb_perimeter(child.box)
+
+    def _remove_leaf(self, leaf):
+        if leaf is self.root:
+            self.root = None
+            return
+        parent = leaf.parent
+        grandparent = parent.parent
+        sibling = parent.child2 if parent.child1 is leaf else parent.child1
+        if grandparent is None:
+            self.root = sibling
+            sibling.parent = None
+        else:
+            if grandparent.child1 is parent:
+                grandparent.child1 = sibling
+            else:
+                grandparent.child2 = sibling
+            sibling.parent = grandparent
+            self._refit(grandparent)
+        leaf.parent = None
+
+    def _refit(self, node):
+        # walks to the root, rebalancing and refitting boxes and heights
+        while node is not None:
+            node = self._balance(node)
+            c1, c2 = node.child1, node.child2
+            node.height = 1 + max(c1.height, c2.height)
+            node.box = aabb_union(c1.box, c2.box)
+            node = node.parent
+
+    def _balance(self, a):
+        if a.is_leaf or a.height < 2:
+            return a
+        b, c = a.child1, a.child2
+        balance = c.height - b.height
+        if balance > 1:
+            return self._rotate_up(a, c, b, right=True)
+        if balance < -1:
+            return self._rotate_up(a, b, c, right=False)
+        return a
+
+    def _rotate_up(self, a, up, other, right):
+        # promotes the taller child `up` of `a` and hands `a` its shorter child
+        f, g = up.child1, up.child2
+        up.child1 = a
+        up.parent = a.parent
+        a.parent = up
+        if up.parent is None:
+            self.root = up
+        elif up.parent.child1 is a:
+            up.parent.child1 = up
+        else:
+            up.parent.child2 = up
+
+        keep, give = (f, g) if f.height > g.height else (g, f)
+        up.child2 = keep
+        if right:
+            a.child2 = give
+        else:
+            a.child1 = give
+        give.parent = a
+        a.box = aabb_union(other.box, give.box)
+        a.height = 1 + max(other.height, give.height)
+        up.box = aabb_union(a.box, keep.box)
+        up.height = 1 + max(a.height, keep.height)
+        return up
+
+    def _leaves(self, aabb):
+        if self.root is None:
+            return
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if not aabbs_overlap(node.box, aabb):
+                continue
+            if node.is_leaf:
+                yield node
+            else:
+                stack.append(node.child1)
+                stack.append(node.child2)
+
+    def query(self, aabb):
+        found = {leaf.body for leaf in self._leaves(aabb)}
+        found.update(self.unbounded)
+        return found
+
+    def raycast(self, line):
+        # bodies whose fat boxes the Line or LineSegment passes through,
+        # ordered by where the ray enters them
+        origin, direction = line.known_point, line.direction
+        tmin, tmax = -math.inf, math.inf
+        if isinstance(line, LineSegment):
+            origin, tmin, tmax = line.p1, 0.0, line.length
+        hits = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            t = ray_aabb(origin, direction, tmin, tmax, node.box)
+            if t is None:
+                continue
+            if node.is_leaf:
+                hits.append((t, self.entries[node.body][0], node.body))
+            else:
+                stack.append(node.child1)
+                stack.append(node.child2)
+        hits.sort(key=lambda h: h[:2])
+        return [body for *_, body in hits]
+
+    def _ordered(self, b1, b2):
+        if self.entries[b1][0] > self.entries[b2][0]:
+            return b2, b1
+        return b1, b2
+
+    def candidate_pairs(self):
+        entries = self.entries
+        for body, (order, leaf) in entries.items():
+            if leaf is None:
+                continue
+            for other in self._leaves(leaf.box):
+                if entries[other.body][0] > order:
+                    yield body, other.body
+        for i, b1 in enumerate(self.unbounded):
+            for b2 in self.unbounded[i + 1 :]:
+                yield self._ordered(b1, b2)
+            for b2 in self.raycast(b1):
+                yield self._ordered(b1, b2)
+
+    def height(self):
+        return 0 if self.root is None else self.root.height
+
+    def clear(self):
+        self.root = None
+        self.entries.clear()
+        self.unbounded.clear()
+
+    def __repr__(self):
+        return (
+            f"<DynamicAABBTree margin={self.margin} bodies={len(self.entries)}"
+            f" height={self.height()}>"
+        )
+
+
+class SweepAndPrune:
+    # endpoints stay sorted between frames, so after small motions the
+    # insertion sort only does a few swaps and each swap updates the pair set
+    def __init__(self, axes=(0, 1)) -> None:
+        self.axes = tuple(axes)
+        # per axis list of endpoints, [value, body, is_min]
+        self.endpoints = {axis: [] for axis in self.axes}
+        # body -> [insertion order, aabb, {axis: (min endpoint, max endpoint)}]
+        self.entries = {}
+        # (order1, order2) -> (body1, body2), overlapping on every tracked axis
+        self.pairs = {}
+        self.unbounded = []
+        self.swaps = 0
+        self._dirty = False
+        self._inserted = 0
+        self._counter = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, body):
+        return body in self.entries
+
+    def insert(self, body):
+        if body in self.entries:
+            return self.update(body)
+        aabb = body.aabb()
+        ends = {}
+        self.entries[body] = [self._counter, aabb, ends]
+        self._counter += 1
+        if aabb is None:
+            self.unbounded.append(body)
+            return
+        for axis in self.axes:
+            lo = [aabb[axis], body, True]
+            hi = [aabb[axis + 2], body, False]
+            ends[axis] = lo, hi
+            self.endpoints[axis] += [lo, hi]
+        self._inserted += 1
+        self._dirty = True
+
+    def remove(self, body):
+        order, aabb, ends = self.entries.pop(body)
+        if aabb is None:
+            self.unbounded.remove(body)
+            return
+        for axis, (lo, hi) in ends.items():
+            endpoints = self.endpoints[axis]
+            endpoints.remove(lo)
+            endpoints.remove(hi)
+        for key in [key for key in self.pairs if order in key]:
+            del self.pairs[key]
+
+    def update(self, body):
+        # only refreshes the endpoint values, the sort runs once per query
+        if body not in self.entries:
+            return self.insert(body)
+        entry = self.entries[body]
+        if entry[1] is None:
+            return
+        aabb = body.aabb()
+        entry[1] = aabb
+        for axis, (lo, hi) in entry[2].items():
+            lo[0] = aabb[axis]
+            hi[0] = aabb[axis + 2]
+        self._dirty = True
+
+    def translate(self, body, tvec):
+        body.translate(tvec)
+        self.update(body)
+
+    def rotate(self, body, a, point):
+        body.rotate(a, point)
+        self.update(body)
+
+    def _overlap(self, b1, b2):
+        box1, box2 = self.entries[b1][1], self.entries[b2][1]
+        for axis in self.axes:
+            if box1[axis + 2] < box2[axis] or box2[axis + 2] < box1[axis]:
+                return False
+        return True
+
+    def _key(self, b1, b2):
+        o1, o2 = self.entries[b1][0], self.entries[b2][0]
+        return ((o1, o2), (b1, b2)) if o1 < o2 else ((o2, o1), (b2, b1))
+
+    def _sort_axis(self, axis):
+        endpoints = self.endpoints[axis]
+        pairs = self.pairs
+        swaps = 0
+        for i in range(1, len(endpoints)):
+            e = endpoints[i]
+            value, body, is_min = e
+            j = i - 1
+            # the order of rebuild, mins before maxes on ties
+            while j >= 0 and (
+                endpoints[j][0] > value
+                or endpoints[j][0] == value
+                and is_min
+                and not endpoints[j][2]
+            ):
+                f = endpoints[j]
+                if is_min and not f[2]:
+                    # a min moved below a max, the bodies may start touching
+                    if self._overlap(body, f[1]):
+                        key, pair = self._key(body, f[1])
+                        pairs[key] = pair
+                elif not is_min and f[2]:
+                    # a max moved below a min, the bodies separated
+                    pairs.pop(self._key(body, f[1])[0], None)
+                endpoints[j + 1] = f
+                j -= 1
+                swaps += 1
+            endpoints[j + 1] = e
+        return swaps
+
+    def rebuild(self):
+        # full sort and a single sweep, used when many bodies were added at
+        # once and sorting them in one by one would be quadratic
+        for endpoints in self.endpoints.values():
+            # mins go first on ties so touching boxes count as overlapping
+            endpoints.sort(key=lambda e: (e[0], not e[2]))
+        self.pairs.clear()
+        active = {}
+        for _, body, is_min in self.endpoints[self.axes[0]]:
+            if not is_min:
+                del active[body]
+                continue
+            for other in active:
+                if self._overlap(body, other):
+                    key, pair = self._key(body, other)
+                    self.pairs[key] = pair
+            active[body] = None
+
+    def sort(self):
+        if self._inserted > max(8, len(self.entries) // 16):
+            self.rebuild()
+            self.swaps = 0
+        else:
+            self.swaps = sum(self._sort_axis(axis) for axis in self.axes)
+        self._dirty = False
+        self._inserted = 0
+        return self.swaps
+
+    def candidate_pairs(self):
+        if self._dirty:
+            self.sort()
+        full = len(self.axes) == 2
+        for key in sorted(self.pairs):
+            b1, b2 = self.pairs[key]
+            if full or aabbs_overlap(self.entries[b1][1], self.entries[b2][1]):
+                yield b1, b2
+        for i, b1 in enumerate(self.unbounded):
+            for b2 in self.unbounded[i + 1 :]:
+                yield self._key(b1, b2)[1]
+            for b2, (_, aabb, _) in self.entries.items():
+                if aabb is not None:
+                    yield self._key(b1, b2)[1]
+
+    def query(self, aabb):
+        found = {
+            body
+            for body, (_, box, _) in self.entries.items()
+            if box is not None and aabbs_overlap(box, aabb)
+        }
+        found.update(self.unbounded)
+        return found
+
+    def clear(self):
+        for endpoints in self.endpoints.values():
+            endpoints.clear()
+        self.entries.clear()
+        self.pairs.clear()
+        self.unbounded.clear()
+        self._inserted = 0
+
+    def __repr__(self):
+        return (
+            f"<SweepAndPrune axes={self.axes} bodies={len(self.entries)}"
+            f" pairs={len(self.pairs)}>"
+        )
@@ -0,0 +1,204 @@
+# continuous collision detection for bodies moving by a translation per step
+
+from . import np
+from ._types import Collision, Circle, SimpleConvexPolygon
+from .gjk import gjk
+from .auxiliary import aabb_union, project
+from .broadphase import DynamicAABBTree
+
+CA_MAX_ITERATIONS = 32
+
+
+def swept_aabb(structure, motion):
+    # box of the whole path, None for unbounded structures
+    box = structure.aabb()
+    if box is None:
+        return None
+    tx, ty = motion
+    return aabb_union(box, (box[0] + tx, box[1] + ty, box[2] + tx, box[3] + ty))
+
+
+class _Moved:
+    # a shape seen displaced by offset, enough for gjk
+    __slots__ = ("shape", "offset")
+
+    def __init__(self, shape, offset) -> None:
+        self.shape = shape
+        self.offset = offset
+
+    @property
+    def center(self):
+        return self.shape.center + self.offset
+
+    def support(self, d):
+        return self.shape.support(d) + self.offset
+
+
+class _SweptProxy:
+    # stands in for a moving body inside a broad phase, boxed by its path
+    __slots__ = ("body", "box")
+
+    def __init__(self, body, box) -> None:
+        self.body = body
+        self.box = box
+
+    def aabb(self):
+        return self.box
+
+
+def _impact(toi, point, normal):
+    details = {"toi": toi, "point": point, "normal": normal}
+    return Collision(True, point=point, normal=normal, details=details)
+
+
+class ContinuousCollisions:
+    # every test takes both bodies with their motion over the step and reports
+    # the earliest time of impact in [0, 1] as toi, with the contact point and
+    # the normal pointing from the first body towards the second at that time
+
+    @staticmethod
+    def polygon_polygon_toi(poly1, motion1, poly2, motion2):
+        # swept SAT, on every axis the projections of poly2 slide along the
+        # relative motion, the shapes touch once every interval overlaps
+        axes = np.concatenate((poly1.axes, poly2.axes))
+        proj1 = project(poly1.vertices, axes)
+        proj2 = project(poly2.vertices, axes)
+        min1, max1 = proj1.min(axis=0), proj1.max(axis=0)
+        min2, max2 = proj2.min(axis=0), proj2.max(axis=0)
+        velocity = axes.dot(np.subtract(motion2, motion1))
+        moving = velocity != 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t_low = (min1 - max2) / velocity
+            t_high = (max1 - min2) / velocity
+        overlapping = (max2 >= min1) & (min2 <= max1)
+        still = np.where(overlapping, -np.inf, np.inf)
+        enter = np.where(moving, np.where(velocity > 0, t_low, t_high), still)
+        leave = np.where(moving, np.where(velocity > 0, t_high, t_low), -still)
+        best = enter.argmax()
+        t_enter, t_leave = enter[best], leave.min()
+        if t_enter > t_leave or t_enter > 1 or t_leave < 0:
+            return Collision(False)
+
+        if t_enter <= 0:
+            # already overlapping, report the minimum overlap axis like SAT
+            overlaps = np.minimum(max1, max2) - np.maximum(min1, min2)
+            best = overlaps.argmin()
+            normal = axes[best]
+            if normal.dot(poly2.center - poly1.center) < 0:
+                normal = -normal
+            toi = 0.0
+        else:
+            normal = axes[best] if velocity[best] < 0 else -axes[best]
+            toi = float(t_enter)
+        # the vertex of poly2 leading into poly1
+        vertices = poly2.vertices + toi * np.asarray(motion2, dtype=float)
+        point = vertices[vertices.dot(normal).argmin()]
+        return _impact(toi, point, normal)
+
+    @staticmethod
+    def circle_circle_toi(circle1, motion1, circle2, motion2):
+        # roots of |p + v t| = r1 + r2
+        p = circle2.center - circle1.center
+        v = np.subtract(motion2, motion1)
+        r = circle1.radius + circle2.radius
+        c = p.dot(p) - r * r
+        if c <= 0:
+            toi = 0.0
+        else:
+            a, b = v.dot(v), 2 * p.dot(v)
+            disc = b * b - 4 * a * c
+            if not a or b >= 0 or disc < 0:
+                return Collision(False)
+            toi = float((-b - np.sqrt(disc)) / (2 * a))
+            if toi > 1:
+                return Collision(False)
+        d = p + toi * v
+        dist = np.hypot(*d)
+        normal = d / dist if dist else np.array((1.0, 0.0))
+        point = circle1.center + toi * np.asarray(motion1) + circle1.radius * normal
+        return _impact(toi, point, normal)
+
+    @staticmethod
+    def conservative_advancement(shape1, motion1, shape2, motion2, tolerance=1e-6):
+        # any pair of convex shapes with support functions. the distance of
+        # two translating convex shapes is convex in time, so stepping by
+        # distance / closing speed never overshoots the first contact
+        motion1 = np.asarray(motion1, dtype=float)
+        motion2 = np.asarray(motion2, dtype=float)
+        v = motion2 - motion1
+        t = 0.0
+        for _ in range(CA_MAX_ITERATIONS):
+            result = gjk(_Moved(shape1, t * motion1), _Moved(shape2, t * motion2))
+            if result.overlap:
+                if t == 0.0:
+                    normal = shape2.center - shape1.center
+                    length = np.hypot(*normal)
+                    normal = normal / length if length else np.array((1.0, 0.0))
+                    point = (shape1.center + shape2.center) / 2
+                return _impact(t, point, normal)
+            pa, pb = result.points
+            normal = (pb - pa) / result.distance
+            point = (pa + pb) / 2
+            if result.distance <= tolerance:
+                return _impact(t, point, normal)
+            closing = -v.dot(normal)
+            if closing <= 0:
+                return Collision(False)
+            t += result.distance / closing
+            if t > 1:
+                return Collision(False)
+        return _impact(t, point, normal)
+
+    @staticmethod
+    def toi(s1, motion1, s2, motion2):
+        polygon, circle = SimpleConvexPolygon, Circle
+        if isinstance(s1, polygon) and isinstance(s2, polygon):
+            return __class__.polygon_polygon_toi(s1, motion1, s2, motion2)
+        if isinstance(s1, circle) and isinstance(s2, circle):
+            return __class__.circle_circle_toi(s1, motion1, s2, motion2)
+        if isinstance(s1, (polygon, circle)) and isinstance(s2, (polygon, circle)):
+            return __class__.conservative_advancement(s1, motion1, s2, motion2)
+        return None
+
+
+def swept_candidates(index, motions):
+    # pairs that may meet during the step. motions maps moving bodies to
+    # their translation, everything else in index stays put. moving bodies
+    # are paired with resting ones through index.query on their swept box
+    # and with each other through a tree over the swept boxes
+    pairs = []
+    proxies = []
+    for body, motion in motions.items():
+        box = swept_aabb(body, motion)
+        if box is None:
+            continue
+        proxies.append(_SweptProxy(body, box))
+        for other in sorted(index.query(box), key=lambda b: index.entries[b][0]):
+            if other is not body and other not in motions:
+                pairs.append((body, other))
+    if len(proxies) > 1:
+        tree = DynamicAABBTree(margin=0.0)
+        for proxy in proxies:
+            tree.insert(proxy)
+        pairs.extend((p1.body, p2.body) for p1, p2 in tree.candidate_pairs())
+    return pairs
+
+
+def impacts(index, motions):
+    # (body1, body2, collision) for every pair that meets during the step,
+    # earliest first. bodies without a time of impact test are left out
+    zero = np.zeros(2)
+    found = []
+    for b1, b2 in swept_candidates(index, motions):
+        collision = ContinuousCollisions.toi(
+            b1, motions.get(b1, zero), b2, motions.get(b2, zero)
+        )
+        if collision:
+            found.append((b1, b2, collision))
+    found.sort(key=lambda impact: impact[2].toi)
+    return found
+
+
+def earliest_impact(index, motions):
+    found = impacts(index, motions)
+    return found[0] if found else None
@@ -0,0 +1,217 @@
+from ._types import Collision
+from ._types import Circle, Line, LineSegment, SimpleConvexPolygon
+from .lines import SegmentBatch
+from . import np
+from .auxiliary import cross2, circles_overlap
+from .profiling import profiler
+
+
+def _contact(point, normal, depth):
+    # same details as the polygon tests, normal points from the circle away
+    return Collision(
+        True,
+        {
+            "point": point,
+            "normal": normal,
+            "penetration_vector": depth * normal,
+        },
+    )
+
+
+def _unit(v, fallback):
+    # rows of v normalized, zero rows get the fallback direction
+    length = np.hypot(v[..., 0], v[..., 1])
+    safe = np.where(length > 0, length, 1.0)
+    return np.where((length > 0)[..., None], v / safe[..., None], fallback), length
+
+
+class CircleCollisions:
+    @staticmethod
+    def circle_point(circle: Circle, point):
+        d = point - circle.center
+        return Collision(bool(d.dot(d) <= circle.radius * circle.radius))
+
+    @staticmethod
+    def circle_circle(circle1: Circle, circle2: Circle):
+        if not circles_overlap(
+            circle1.center, circle1.radius, circle2.center, circle2.radius
+        ):
+            return Collision(False)
+        d = circle2.center - circle1.center
+        dist = np.hypot(*d)
+        normal = d / dist if dist else np.array((1.0, 0.0))
+        depth = circle1.radius + circle2.radius - dist
+        return _contact(circle1.center + circle1.radius * normal, normal, depth)
+
+    @staticmethod
+    def circle_line(circle: Circle, line: Line):
+        # signed distance of the center from the line along its left normal
+        n = np.array((-line.direction[1], line.direction[0]))
+        offset = cross2(line.direction, circle.center - line.known_point)
+        if abs(offset) > circle.radius:
+            return Collision(False)
+        normal = -n if offset > 0 else n
+        point = circle.center - offset * n
+        return _contact(point, normal, circle.radius - abs(offset))
+
+    @staticmethod
+    def circle_segment(circle: Circle, segment: LineSegment):
+        s = segment.segment
+        ss = s.dot(s)
+        t = (circle.center - segment.p1).dot(s) / ss if ss else 0.0
+        closest = segment.p1 + min(max(t, 0.0), 1.0) * s
+        d = closest - circle.center
+        dd = d.dot(d)
+        if dd > circle.radius * circle.radius:
+            return Collision(False)
+        dist = np.sqrt(dd)
+        if dist:
+            normal = d / dist
+        else:
+            # center on the segment, push out along the segment normal
+            normal = segment.normals[0]
+        return _contact(closest, normal, circle.radius - dist)
+
+    @staticmethod
+    def circle_polygon(circle: Circle, polygon: SimpleConvexPolygon):
+        if not circles_overlap(
+            circle.center, circle.radius, polygon.position, polygon.radius
+        ):
+            return Collision(False)
+        indices = np.array(polygon.side_indices, dtype=np.intp).reshape(-1, 2)
+        v1 = polygon.vertices[indices[:, 0]]
+        e = polygon.vertices[indices[:, 1]] - v1
+        c = circle.center
+        # distances of the center in front of every side
+        separations = np.einsum("ij,ij->i", c - v1, polygon.normals)
+        face = separations.argmax()
+        if separations[face] > circle.radius:
+            return Collision(False)
+        if separations[face] <= 0:
+            # the center is inside, leave through the closest side
+            normal = -polygon.normals[face]
+            point = c + separations[face] * normal
+            return _contact(point, normal, circle.radius - separations[face])
+
+        t = np.einsum("ij,ij->i", c - v1, e) / np.einsum("ij,ij->i", e, e)
+        closest = v1 + np.clip(t, 0.0, 1.0)[:, None] * e
+        d = closest - c
+        dd = np.einsum("ij,ij->i", d, d)
+        k = dd.argmin()
+        if dd[k] > circle.radius * circle.radius:
+            return Collision(False)
+        dist = np.sqrt(dd[k])
+        normal = d[k] / dist if dist else -polygon.normals[face]
+        return _contact(closest[k], normal, circle.radius - dist)
+
+    # batch versions test row k against row k and return arrays, misses
+    # have zero normals and depths
+
+    @staticmethod
+    def circle_circle_batch(centers1, radii1, centers2, radii2):
+        centers1 = np.asarray(centers1, dtype=float).reshape(-1, 2)
+        centers2 = np.asarray(centers2, dtype=float).reshape(-1, 2)
+        reach = np.asarray(radii1, dtype=float) + np.asarray(radii2, dtype=float)
+        normals, dist = _unit(centers2 - centers1, (1.0, 0.0))
+        hits = dist <= reach
+        normals[~hits] = 0.0
+        depths = np.where(hits, reach - dist, 0.0)
+        points = centers1 + np.asarray(radii1, dtype=float)[..., None] * normals
+        return hits, points, normals, depths
+
+    @staticmethod
+    def circle_line_batch(centers, radii, points, directions):
+        # lines given by a known point and a unit direction per row
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        directions = np.asarray(directions, dtype=float).reshape(-1, 2)
+        radii = np.asarray(radii, dtype=float)
+        n = np.stack((-directions[:, 1], directions[:, 0]), axis=1)
+        offsets = cross2(directions, centers - points)
+        hits = np.abs(offsets) <= radii
+        normals = np.where((offsets > 0)[:, None], -n, n)
+        normals[~hits] = 0.0
+        depths = np.where(hits, radii - np.abs(offsets), 0.0)
+        return hits, centers - offsets[:, None] * n, normals, depths
+
+    @staticmethod
+    def circle_segment_batch(centers, radii, segments: SegmentBatch):
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        radii = np.asarray(radii, dtype=float)
+        p1, s = segments.p1, segments.d
+        ss = np.einsum("ij,ij->i", s, s)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.einsum("ij,ij->i", centers - p1, s) / ss
+        t = np.where(ss > 0, np.clip(t, 0.0, 1.0), 0.0)
+        closest = p1 + t[:, None] * s
+        fallback = np.stack((-s[:, 1], s[:, 0]), axis=1)
+        fallback, _ = _unit(fallback, (1.0, 0.0))
+        normals, dist = _unit(closest - centers, fallback)
+        hits = dist <= radii
+        normals[~hits] = 0.0
+        depths = np.where(hits, radii - dist, 0.0)
+        return hits, closest, normals, depths
+
+    # lists of pairs for the dispatcher, results keep the input order
+
+    @staticmethod
+    def _collisions(hits, points, normals, depths):
+        return [
+            _contact(point, normal, depth) if hit else Collision(False)
+            for hit, point, normal, depth in zip(hits.tolist(), points, normals, depths)
+        ]
+
+    @staticmethod
+    def circle_circle_many(pairs):
+        if not pairs:
+            return []
+        result = __class__.circle_circle_batch(
+            [c1.center for c1, _ in pairs],
+            [c1.radius for c1, _ in pairs],
+            [c2.center for _, c2 in pairs],
+            [c2.radius for _, c2 in pairs],
+        )
+        return __class__._collisions(*result)
+
+    @staticmethod
+    def circle_line_many(pairs):
+        if not pairs:
+            return []
+        result = __class__.circle_line_batch(
+            [c.center for c, _ in pairs],
+            [c.radius for c, _ in pairs],
+            [line.known_point for _, line in pairs],
+            [line.direction for _, line in pairs],
+        )
+        return __class__._collisions(*result)
+
+    @staticmethod
+    def circle_segment_many(pairs):
+        if not pairs:
+            return []
+        result = __class__.circle_segment_batch(
+            [c.center for c, _ in pairs],
+            [c.radius for c, _ in pairs],
+            SegmentBatch.from_segments([ls for _, ls in pairs]),
+        )
+        return __class__._collisions(*result)
+
+    @staticmethod
+    def circle_polygon_many(pairs):
+        # bounding circles sort out the misses in one call, only pairs that
+        # come close run the per side test
+        if not pairs:
+            return []
+        near, _, _, _ = __class__.circle_circle_batch(
+            [c.center for c, _ in pairs],
+            [c.radius for c, _ in pairs],
+            [poly.position for _, poly in pairs],
+            [poly.radius for _, poly in pairs],
+        )
+        if profiler.enabled:
+            rejected = len(near) - int(near.sum())
+            profiler.count("circle_polygon_rejected_circle", rejected)
+        return [
+            __class__.circle_polygon(*pair) if hit else Collision(False)
+            for pair, hit in zip(pairs, near.tolist())
+        ]
@@ -0,0 +1,250 @@
+# reusable storage for contact results, per frame and across frames
+
+from collections import OrderedDict
+from . import np, math
+from ._types import Collision, LineSegment
+from .auxiliary import rotation_matrix_2d
+
+
+class ContactBuffer:
+    # structure of arrays, one row per contact. batch kernels write whole
+    # arrays into it and it is reset instead of reallocated between frames
+    def __init__(self, capacity=1024) -> None:
+        self.count = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.pair = np.empty(capacity, dtype=np.intp)
+        self.point = np.empty((capacity, 2))
+        self.normal = np.empty((capacity, 2))
+        self.penetration = np.empty(capacity)
+
+    @property
+    def capacity(self):
+        return len(self.pair)
+
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        old = self.pair, self.point, self.normal, self.penetration
+        self._allocate(max(capacity, 2 * self.capacity))
+        for new, array in zip(
+            (self.pair, self.point, self.normal, self.penetration), old
+        ):
+            new[: self.count] = array[: self.count]
+
+    def reset(self):
+        self.count = 0
+
+    def extend(self, pair, point, normal, penetration):
+        n = len(pair)
+        start, stop = self.count, self.count + n
+        self.reserve(stop)
+        self.pair[start:stop] = pair
+        self.point[start:stop] = point
+        self.normal[start:stop] = normal
+        self.penetration[start:stop] = penetration
+        self.count = stop
+
+    def append(self, pair, point, normal, penetration):
+        self.reserve(self.count + 1)
+        k = self.count
+        self.pair[k] = pair
+        self.point[k] = point
+        self.normal[k] = normal
+        self.penetration[k] = penetration
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, k):
+        # builds a Collision on demand, readable like the scalar results
+        if k < 0:
+            k += self.count
+        if not 0 <= k < self.count:
+            raise IndexError(k)
+        point = self.point[k].copy()
+        normal = self.normal[k].copy()
+        penetration = float(self.penetration[k])
+        return Collision(
+            status=True,
+            point=point,
+            normal=normal,
+            penetration=penetration,
+            details={
+                "point": point,
+                "normal": normal,
+                "penetration_vector": penetration * normal,
+            },
+        )
+
+    def __iter__(self):
+        for k in range(self.count):
+            yield self[k]
+
+    def __repr__(self):
+        return f"<ContactBuffer contacts={self.count} capacity={self.capacity}>"
+
+
+class _CachedContact:
+    __slots__ = (
+        "body1",
+        "body2",
+        "geometry1",
+        "geometry2",
+        "pose1",
+        "pose2",
+        "relative",
+        "axis",
+        "collision",
+        "frame",
+    )
+
+
+def _pose(body):
+    x, y = body.position.tolist()
+    return x, y, body.angle
+
+
+def _relative(pose1, pose2):
+    # pose of the second body in the frame of the first
+    x1, y1, a1 = pose1
+    x2, y2, a2 = pose2
+    dx, dy = x2 - x1, y2 - y1
+    c, s = math.cos(a1), math.sin(a1)
+    # inverse of the row vector rotation used for poses
+    return dx * c - dy * s, dx * s + dy * c, a2 - a1
+
+
+def _close(p, q, linear, angular):
+    return (
+        abs(p[0] - q[0]) <= linear
+        and abs(p[1] - q[1]) <= linear
+        and abs(p[2] - q[2]) <= angular
+    )
+
+
+def _moved_collision(collision, old_pose, new_pose):
+    # the same contact carried along a rigid motion of both bodies
+    rotation = rotation_matrix_2d(new_pose[2] - old_pose[2])
+    old_origin = np.array(old_pose[:2])
+    new_origin = np.array(new_pose[:2])
+
+    def move_point(p):
+        return (p - old_origin).dot(rotation) + new_origin
+
+    details = collision.details
+    structures = [
+        LineSegment(move_point(s.p1), move_point(s.p2))
+        if isinstance(s, LineSegment)
+        else move_point(s)
+        for s in details["collision_structures"]
+    ]
+    point = details["point"]
+    if point is not None:
+        # the point is one of the structures, keep it that way
+        index = next(
+            k for k, s in enumerate(details["collision_structures"]) if s is point
+        )
+        point = structures[index]
+    return Collision(
+        True,
+        {
+            "point": point,
+            "normal": details["normal"].dot(rotation),
+            "collision_structures": structures,
+            "penetration_vector": details["penetration_vector"].dot(rotation),
+        },
+    )
+
+
+class ContactCache:
+    # last SAT result per polygon pair with the axis that decided it. a pair
+    # whose poses haven't changed gets its old result back, one that moved
+    # rigidly gets it carried along, and any other pair first checks the old
+    # separating axis. least recently used entries go once there are more
+    # than maxsize, and entries unused for max_age ticks are dropped
+    def __init__(
+        self, maxsize=4096, max_age=60, linear_tolerance=1e-9, angular_tolerance=1e-9
+    ) -> None:
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self.linear_tolerance = linear_tolerance
+        self.angular_tolerance = angular_tolerance
+        self.entries = OrderedDict()
+        self.frame = 0
+
+    def get(self, body1, body2):
+        # entries hold their bodies, so an id can't be reused while cached
+        entry = self.entries.get((id(body1), id(body2)))
+        if entry is None:
+            return None
+        if (
+            body1.geometry is not entry.geometry1
+            or body2.geometry is not entry.geometry2
+        ):
+            return None
+        entry.frame = self.frame
+        self.entries.move_to_end((id(body1), id(body2)))
+        return entry
+
+    def reuse(self, entry, body1, body2):
+        # the cached collision if the poses allow it, None otherwise
+        linear, angular = self.linear_tolerance, self.angular_tolerance
+        pose1, pose2 = _pose(body1), _pose(body2)
+        if _close(pose1, entry.pose1, linear, angular) and _close(
+            pose2, entry.pose2, linear, angular
+        ):
+            return entry.collision
+        relative = _relative(pose1, pose2)
+        if not _close(relative, entry.relative, linear, angular):
+            return None
+        if entry.collision:
+            entry.collision = _moved_collision(entry.collision, entry.pose1, pose1)
+        entry.pose1, entry.pose2 = pose1, pose2
+        return entry.collision
+
+    def store(self, body1, body2, collision, axis):
+        key = id(body1), id(body2)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = _CachedContact()
+            self.entries[key] = entry
+        entry.body1, entry.body2 = body1, body2
+        entry.geometry1, entry.geometry2 = body1.geometry, body2.geometry
+        entry.pose1, entry.pose2 = _pose(body1), _pose(body2)
+        entry.relative = _relative(entry.pose1, entry.pose2)
+        entry.axis = axis
+        entry.collision = collision
+        entry.frame = self.frame
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def tick(self):
+        # once per step, ages out the pairs that stopped coming up
+        self.frame += 1
+        oldest = self.frame - self.max_age
+        entries = self.entries
+        while entries:
+            key = next(iter(entries))
+            if entries[key].frame >= oldest:
+                break
+            del entries[key]
+
+    def forget(self, body):
+        for key in [key for key in self.entries if id(body) in key]:
+            del self.entries[key]
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __repr__(self):
+        return f"<ContactCache pairs={len(self.entries)} frame={self.frame}>"
+
+
+contact_cache = ContactCache()
@@ -0,0 +1,157 @@
+# picks the collision function for a pair of structures by their types
+
+from collections import defaultdict
+from functools import partial, update_wrapper
+from . import logger
+from .profiling import profiler
+from ._types import Line, LineSegment, SimpleConvexPolygon, Circle
+from .lines import LineCollisions
+from .polygons import SimpleConvexPolygonCollisions
+from .circles import CircleCollisions
+
+
+class CollisionDispatcher:
+    def __init__(self) -> None:
+        # (type1, type2) -> (function, swapped), filled for both orders
+        self.handlers = {}
+        # (type1, type2) -> function taking a list of pairs
+        self.batch_handlers = {}
+        # resolved lookups, subclasses are matched through their mro once
+        self._resolved = {}
+
+    def register(self, type1, type2, func, batch=None):
+        self.handlers[(type1, type2)] = (func, False)
+        if batch is not None:
+            self.batch_handlers[(type1, type2)] = batch
+        if type1 is not type2 and (type2, type1) not in self.handlers:
+            self.handlers[(type2, type1)] = (func, True)
+        self._resolved.clear()
+
+    def resolve(self, type1, type2):
+        key = (type1, type2)
+        if key not in self._resolved:
+            found = None
+            for t1 in type1.__mro__:
+                for t2 in type2.__mro__:
+                    if (t1, t2) in self.handlers:
+                        found = (t1, t2), self.handlers[(t1, t2)]
+                        break
+                if found:
+                    break
+            if found is None:
+                logger.warning(f"no collision function for {type1} and {type2}")
+            self._resolved[key] = found
+        return self._resolved[key]
+
+    def collide(self, s1, s2):
+        found = self.resolve(type(s1), type(s2))
+        if found is None:
+            raise KeyError((type(s1), type(s2)))
+        _, (func, swapped) = found
+        if swapped:
+            # handlers report normals from their first argument to the second
+            return func(s2, s1).mirrored()
+        return func(s1, s2)
+
+    def collide_pairs(self, pairs):
+        # groups the pairs by type combination so groups with a batch kernel
+        # go through it in one call, results keep the order of the input.
+        # pairs without a collision function get None
+        # pairs is usually a broad phase generator, consuming it is where
+        # the broad phase does its work. a list was already timed by whoever
+        # built it, World.pairs for one
+        if not isinstance(pairs, list):
+            with profiler.phase("broad_phase"):
+                pairs = list(pairs)
+        with profiler.phase("narrow_phase"):
+            return self._collide_grouped(pairs)
+
+    def _collide_grouped(self, pairs):
+        if profiler.enabled:
+            profiler.count("pairs_considered", len(pairs))
+        results = [None] * len(pairs)
+        groups = defaultdict(list)
+        resolve = self.resolve
+        for k, (s1, s2) in enumerate(pairs):
+            found = resolve(type(s1), type(s2))
+            if found is None:
+                continue
+            key, (_, swapped) = found
+            groups[key, swapped].append(k)
+
+        for (key, swapped), indices in groups.items():
+            ordered = [pairs[k][::-1] if swapped else pairs[k] for k in indices]
+            # swapped groups are ordered like the registration, so is its batch
+            batch = self.batch_handlers.get(key[::-1] if swapped else key)
+            func = batch or self.handlers[key][0]
+            # one timer per collision function, inside narrow_phase
+            with profiler.phase(func.__name__):
+                if batch is not None:
+                    collisions = batch(ordered)
+                else:
+                    collisions = [func(s1, s2) for s1, s2 in ordered]
+            if swapped:
+                collisions = [collision.mirrored() for collision in collisions]
+            for k, collision in zip(indices, collisions):
+                results[k] = collision
+        return results
+
+
+def default_dispatcher(contact_cache=None):
+    # with a ContactCache polygon pairs go through the cached SAT one by one
+    # instead of the batch kernel, which pays off once pairs persist
+    dispatcher = CollisionDispatcher()
+    if contact_cache is None:
+        dispatcher.register(
+            SimpleConvexPolygon,
+            SimpleConvexPolygon,
+            SimpleConvexPolygonCollisions.polygon_polygon_SAT,
+            batch=SimpleConvexPolygonCollisions.polygon_polygon_SAT_many,
+        )
+    else:
+        cached = SimpleConvexPolygonCollisions.polygon_polygon_SAT_cached
+        dispatcher.register(
+            SimpleConvexPolygon,
+            SimpleConvexPolygon,
+            # keeps the name for the profiler's timers
+            update_wrapper(partial(cached, cache=contact_cache), cached),
+        )
+    dispatcher.register(
+        SimpleConvexPolygon, Line, SimpleConvexPolygonCollisions.polygon_line
+    )
+    dispatcher.register(LineSegment, Line, LineCollisions.segment_line)
+    dispatcher.register(
+        LineSegment,
+        LineSegment,
+        LineCollisions.segment_segment,
+        batch=LineCollisions.segment_segment_many,
+    )
+    dispatcher.register(Line, Line, LineCollisions.line_line)
+    dispatcher.register(
+        Circle,
+        Circle,
+        CircleCollisions.circle_circle,
+        batch=CircleCollisions.circle_circle_many,
+    )
+    dispatcher.register(
+        Circle,
+        Line,
+        CircleCollisions.circle_line,
+        batch=CircleCollisions.circle_line_many,
+    )
+    dispatcher.register(
+        Circle,
+        LineSegment,
+        CircleCollisions.circle_segment,
+        batch=CircleCollisions.circle_segment_many,
+    )
+    dispatcher.register(
+        Circle,
+        SimpleConvexPolygon,
+        CircleCollisions.circle_polygon,
+        batch=CircleCollisions.circle_polygon_many,
+    )
+    return dispatcher
+
+
+dispatcher = default_dispatcher()
@@ -0,0 +1,210 @@
+# GJK and EPA on anything with a support(direction) method and a center
+
+import math
+from collections import OrderedDict
+from . import np
+
+GJK_MAX_ITERATIONS = 64
+EPA_MAX_ITERATIONS = 128
+TOLERANCE = 1e-9
+
+
+def _cross(ux, uy, vx, vy):
+    return ux * vy - uy * vx
+
+
+def minkowski_support(shape1, shape2, d):
+    # simplex vertices are (w, a, b, d) with w = a - b on shape1 - shape2. w
+    # is kept as a float pair, numpy costs more than the arithmetic on it
+    a = shape1.support(d)
+    b = shape2.support(-d)
+    (ax, ay), (bx, by) = a.tolist(), b.tolist()
+    return (ax - bx, ay - by), a, b, d
+
+
+def _closest_on_segment(p, q):
+    (px, py), (qx, qy) = p[0], q[0]
+    ex, ey = qx - px, qy - py
+    ee = ex * ex + ey * ey
+    t = -(px * ex + py * ey) / ee if ee else 0.0
+    if t <= 0:
+        return p[0], [p], (1.0,)
+    if t >= 1:
+        return q[0], [q], (1.0,)
+    return (px + t * ex, py + t * ey), [p, q], (1.0 - t, t)
+
+
+def _closest_on_simplex(simplex):
+    # closest point to the origin, the smallest sub simplex holding it and its
+    # barycentric weights. the point is None if the triangle holds the origin
+    if len(simplex) == 1:
+        return simplex[0][0], simplex, (1.0,)
+    if len(simplex) == 2:
+        return _closest_on_segment(*simplex)
+    a, b, c = simplex
+    (ax, ay), (bx, by), (cx, cy) = a[0], b[0], c[0]
+    area = _cross(bx - ax, by - ay, cx - ax, cy - ay)
+    if area:
+        s1 = _cross(bx - ax, by - ay, -ax, -ay)
+        s2 = _cross(cx - bx, cy - by, -bx, -by)
+        s3 = _cross(ax - cx, ay - cy, -cx, -cy)
+        if area > 0 and min(s1, s2, s3) >= 0 or area < 0 and max(s1, s2, s3) <= 0:
+            return None, simplex, None
+    edges = (_closest_on_segment(p, q) for p, q in ((a, b), (b, c), (c, a)))
+    return min(edges, key=lambda edge: edge[0][0] ** 2 + edge[0][1] ** 2)
+
+
+class GJKResult:
+    def __init__(self, overlap, simplex, weights=None, iterations=0) -> None:
+        self.overlap = overlap
+        self.simplex = simplex
+        self.iterations = iterations
+        self.distance = 0.0
+        self.points = None
+        if weights is not None:
+            # closest points on both shapes from the barycentric weights
+            pa = sum(wt * v[1] for wt, v in zip(weights, simplex))
+            pb = sum(wt * v[2] for wt, v in zip(weights, simplex))
+            self.points = [pa, pb]
+            self.distance = float(np.linalg.norm(pa - pb))
+
+    @property
+    def directions(self):
+        return [v[3] for v in self.simplex]
+
+    def __repr__(self):
+        return (
+            f"GJKResult(overlap={self.overlap}, distance={self.distance},"
+            f" iterations={self.iterations})"
+        )
+
+
+def gjk(shape1, shape2, directions=None):
+    # directions of a previous terminating simplex warm start the search
+    simplex = []
+    for d in directions or ():
+        vertex = minkowski_support(shape1, shape2, d)
+        if not any(vertex[0] == v[0] for v in simplex):
+            simplex.append(vertex)
+    if not simplex:
+        d = shape1.center - shape2.center
+        if not d.any():
+            d = np.array((1.0, 0.0))
+        simplex.append(minkowski_support(shape1, shape2, d))
+
+    for iterations in range(1, GJK_MAX_ITERATIONS + 1):
+        v, simplex, weights = _closest_on_simplex(simplex)
+        if v is None:
+            return GJKResult(True, simplex, iterations=iterations)
+        vx, vy = v
+        vv = vx * vx + vy * vy
+        if vv <= TOLERANCE**2:
+            # touching, the origin is on the boundary of the difference
+            return GJKResult(True, simplex, iterations=iterations)
+        vertex = minkowski_support(shape1, shape2, np.array((-vx, -vy)))
+        wx, wy = vertex[0]
+        if vv - (vx * wx + vy * wy) <= TOLERANCE * vv:
+            break
+        simplex.append(vertex)
+    return GJKResult(False, simplex, weights, iterations)
+
+
+def _full_simplex(shape1, shape2, simplex):
+    # EPA needs a triangle, grow the simplex GJK stopped with if it touched
+    simplex = list(simplex)
+    if len(simplex) == 1:
+        w0 = simplex[0][0]
+        for d in ((1.0, 0.0), (-1.0, 0.0), (0.0, 1.0), (0.0, -1.0)):
+            vertex = minkowski_support(shape1, shape2, np.array(d))
+            if not np.allclose(vertex[0], w0):
+                simplex.append(vertex)
+                break
+    if len(simplex) == 2:
+        (x0, y0), (x1, y1) = simplex[0][0], simplex[1][0]
+        ex, ey = x1 - x0, y1 - y0
+        for d in ((-ey, ex), (ey, -ex)):
+            vertex = minkowski_support(shape1, shape2, np.array(d))
+            wx, wy = vertex[0]
+            if abs(_cross(ex, ey, wx - x0, wy - y0)) > TOLERANCE:
+                simplex.append(vertex)
+                break
+    return simplex if len(simplex) == 3 else None
+
+
+def _edge(p, q):
+    # (distance to the origin, outward normal) of a counter clockwise edge
+    (px, py), (qx, qy) = p[0], q[0]
+    ex, ey = qx - px, qy - py
+    length = math.hypot(ex, ey)
+    if not length:
+        return math.inf, None
+    nx, ny = ey / length, -ex / length
+    return nx * px + ny * py, (nx, ny)
+
+
+def epa(shape1, shape2, simplex):
+    # expands the GJK simplex on shape1 - shape2 towards its closest edge,
+    # returns the normal and depth of the minimum translation and that edge
+    # as a pair of simplex vertices, None if the difference is degenerate
+    polytope = _full_simplex(shape1, shape2, simplex)
+    if polytope is None:
+        return np.array((1.0, 0.0)), 0.0, None
+    (x0, y0), (x1, y1), (x2, y2) = (v[0] for v in polytope)
+    if _cross(x1 - x0, y1 - y0, x2 - x0, y2 - y0) < 0:
+        polytope.reverse()
+    # edges[i] runs from polytope[i] to the next vertex, only the two edges
+    # of an inserted vertex are computed again
+    edges = [_edge(polytope[i], polytope[(i + 1) % 3]) for i in range(3)]
+
+    for _ in range(EPA_MAX_ITERATIONS):
+        index = min(range(len(edges)), key=lambda i: edges[i][0])
+        depth, normal = edges[index]
+        if normal is None:
+            return np.array((1.0, 0.0)), 0.0, None
+        normal = np.array(normal)
+        vertex = minkowski_support(shape1, shape2, normal)
+        wx, wy = vertex[0]
+        if wx * normal[0] + wy * normal[1] - depth <= TOLERANCE * max(1.0, depth):
+            break
+        polytope.insert(index + 1, vertex)
+        after = polytope[(index + 2) % len(polytope)]
+        edges[index : index + 1] = [
+            _edge(polytope[index], vertex),
+            _edge(vertex, after),
+        ]
+    face = polytope[index], polytope[(index + 1) % len(polytope)]
+    return normal, max(float(depth), 0.0), face
+
+
+class SimplexCache:
+    # last terminating simplex per body pair, stored as support directions so
+    # it stays meaningful after the bodies move
+    def __init__(self, maxsize=4096) -> None:
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+    def get(self, shape1, shape2):
+        key = id(shape1), id(shape2)
+        directions = self.entries.get(key)
+        if directions is not None:
+            self.entries.move_to_end(key)
+        return directions
+
+    def store(self, shape1, shape2, result):
+        self.entries[id(shape1), id(shape2)] = result.directions
+        self.entries.move_to_end((id(shape1), id(shape2)))
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def forget(self, shape):
+        for key in [key for key in self.entries if id(shape) in key]:
+            del self.entries[key]
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+simplex_cache = SimplexCache()
@@ -1,17 +1,73 @@
 from ._types import Line, LineSegment
 from ._types import Collision
+import heapq
 from . import *
+from .auxiliary import cross2
+from . import scalar
+
+# below this many segments all_intersections tests every pair, the sweep
+# wins on larger sparse scenes like road graphs (benchmarks.py sweep)
+SWEEP_SEGMENTS = 1024
+# pairs per pass of the dense path, bounds its (rows, N) temporaries
+DENSE_CHUNK = 1 << 18
+
+
+class SegmentBatch:
+    # segments as (N, 2) start points and direction vectors (p2 - p1). when
+    # built from polygons, owner holds the index of the polygon of each edge
+    __slots__ = ("p1", "d", "owner")
+
+    def __init__(self, p1, p2, owner=None) -> None:
+        self.p1 = np.asarray(p1, dtype=float).reshape(-1, 2)
+        self.d = np.asarray(p2, dtype=float).reshape(-1, 2) - self.p1
+        self.owner = owner
+
+    @classmethod
+    def from_segments(cls, segments):
+        p1 = [ls.p1 for ls in segments]
+        p2 = [ls.p2 for ls in segments]
+        return cls(p1, p2)
+
+    @classmethod
+    def from_polygons(cls, polygons):
+        p1, p2, owner = [], [], []
+        for k, poly in enumerate(polygons):
+            indices = np.array(poly.side_indices, dtype=np.intp).reshape(-1, 2)
+            p1.append(poly.vertices[indices[:, 0]])
+            p2.append(poly.vertices[indices[:, 1]])
+            owner.append(np.full(len(indices), k, dtype=np.intp))
+        if not polygons:
+            return cls(np.empty((0, 2)), np.empty((0, 2)), np.empty(0, np.intp))
+        return cls(np.concatenate(p1), np.concatenate(p2), np.concatenate(owner))
+
+    @property
+    def p2(self):
+        return self.p1 + self.d
+
+    def __len__(self):
+        return len(self.p1)
+
+    def __getitem__(self, k):
+        return LineSegment(self.p1[k], self.p2[k])
+
+    def __repr__(self):
+        return f"<SegmentBatch segments={len(self)}>"
 
 
 class LineCollisions:
     @staticmethod
     def line_point(line: Line, point: np.ndarray, atol=2) -> bool:
-        # Calculate the difference between the point and a known point on the line
-        diff = point - line.known_point
-        # Check if the cross product of the difference and line direction is close to zero
-        # This determines if the point lies on the line within a tolerance (atol)
-        intersects = np.isclose(np.cross(diff, line.direction), 0, atol=atol)
-        return Collision(bool(intersects))
+        # The point lies on the line if the cross product of its offset from a
+        # known point and the line direction is zero within atol. two
+        # coordinates are cheaper on floats than through numpy
+        return Collision(
+            scalar.line_point(
+                line.known_point.tolist(),
+                line.direction.tolist(),
+                scalar.xy(point),
+                atol,
+            )
+        )
 
     @staticmethod
     def line_line(line1, line2) -> np.ndarray:
@@ -22,6 +78,9 @@ class LineCollisions:
         ox, oy = line2.direction
         # Construct a matrix using the direction vectors
         M = np.array([[sx, -ox], [sy, -oy]])
+        # Parallel lines leave the system singular, they don't intersect at one point
+        if sx * oy - sy * ox == 0:
+            return Collision(False)
         # Solve the linear system to find the intersection point
         solutions = np.linalg.solve(M, diff)
         # Return the intersection point by evaluating the line function at the solution
@@ -61,12 +120,400 @@ class LineCollisions:
 
     @staticmethod
     def segment_segment(ls1, ls2):
-        # Get the intersection of two line segments treated as lines
-        intersection = __class__.segment_line(ls1, ls2)
-        # If the intersection isn't an array (i.e., no valid point), return False
-        if not intersection:
+        # Closed form intersection on floats, parallel segments don't intersect
+        # at one point and miss like they do in line_line
+        point = scalar.segment_segment(
+            ls1.p1.tolist(), ls1.p2.tolist(), ls2.p1.tolist(), ls2.p2.tolist()
+        )
+        if point is None:
             return Collision(False)
-        # Check if the intersection point lies within the bounds of the second segment
-        return Collision(__class__.segment_point(intersection.point), True)
+        return Collision(np.array(point), True)
     
 
+
+    @staticmethod
+    def _intersect(p, r, q, s):
+        # closed form intersection of p + t * r and q + u * s, broadcasting over
+        # leading axes. parallel pairs get nan parameters instead of raising
+        denom = cross2(r, s)
+        qp = q - p
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = cross2(qp, s) / denom
+            u = cross2(qp, r) / denom
+        parallel = denom == 0
+        t[parallel] = np.nan
+        u[parallel] = np.nan
+        return t, u
+
+    @staticmethod
+    def segment_segment_batch(batch1: SegmentBatch, batch2: SegmentBatch):
+        # every segment of batch1 against every segment of batch2, returns
+        # (N, M) hit mask, parameters on both segments and the points
+        p, r = batch1.p1[:, None], batch1.d[:, None]
+        q, s = batch2.p1[None], batch2.d[None]
+        t, u = __class__._intersect(p, r, q, s)
+        hits = (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+        points = p + t[..., None] * r
+        return hits, t, u, points
+
+    @staticmethod
+    def segment_segment_pairs(batch1: SegmentBatch, batch2: SegmentBatch):
+        # row k of batch1 against row k of batch2
+        t, u = __class__._intersect(batch1.p1, batch1.d, batch2.p1, batch2.d)
+        hits = (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+        points = batch1.p1 + t[:, None] * batch1.d
+        return hits, t, u, points
+
+    @staticmethod
+    def segment_segment_many(pairs):
+        if not pairs:
+            return []
+        batch1 = SegmentBatch.from_segments([ls1 for ls1, _ in pairs])
+        batch2 = SegmentBatch.from_segments([ls2 for _, ls2 in pairs])
+        hits, _, _, points = __class__.segment_segment_pairs(batch1, batch2)
+        return [
+            Collision(point, True) if hit else Collision(False)
+            for hit, point in zip(hits.tolist(), points)
+        ]
+
+    @staticmethod
+    def raycast_many(segments: SegmentBatch, origins, directions, max_t=np.inf):
+        # R rays against every segment, returns per ray the parameter of the
+        # closest hit (inf if none), the hit point and the segment index (-1)
+        origins = np.asarray(origins, dtype=float).reshape(-1, 2)
+        directions = np.asarray(directions, dtype=float).reshape(-1, 2)
+        max_t = np.broadcast_to(np.asarray(max_t, dtype=float), len(origins))
+        if not len(segments):
+            empty = np.full(len(origins), np.inf)
+            return empty, np.full((len(origins), 2), np.nan), np.full(len(origins), -1)
+        p, r = origins[:, None], directions[:, None]
+        t, u = __class__._intersect(p, r, segments.p1[None], segments.d[None])
+        hits = (t >= 0) & (t <= max_t[:, None]) & (u >= 0) & (u <= 1)
+        t = np.where(hits, t, np.inf)
+        index = t.argmin(axis=1)
+        rows = np.arange(len(origins))
+        closest = t[rows, index]
+        missed = np.isinf(closest)
+        index[missed] = -1
+        points = origins + np.where(missed, np.nan, closest)[:, None] * directions
+        return closest, points, index
+
+    @staticmethod
+    def raycast(segments: SegmentBatch, origin, direction, max_t=np.inf):
+        # closest hit of one ray, t is in units of direction's length
+        t, points, index = __class__.raycast_many(segments, origin, direction, max_t)
+        if index[0] < 0:
+            return Collision(False)
+        d = segments.d[index[0]]
+        normal = np.array((-d[1], d[0])) / np.hypot(*d)
+        # the normal faces the incoming ray
+        if normal.dot(direction) > 0:
+            normal = -normal
+        details = {"t": float(t[0]), "index": int(index[0])}
+        return Collision(points[0], True, normal=normal, details=details)
+
+    @staticmethod
+    def all_intersections(segments):
+        # every intersecting pair among a list of LineSegments or a SegmentBatch
+        if not isinstance(segments, SegmentBatch):
+            segments = SegmentBatch.from_segments(segments)
+        if len(segments) < SWEEP_SEGMENTS:
+            return __class__._all_intersections_dense(segments)
+        return sweep_intersections(segments.p1, segments.p2)
+
+    @staticmethod
+    def _all_intersections_dense(segments: SegmentBatch):
+        # segment_segment_batch of the batch with itself, a block of rows at a
+        # time against the columns from the block on
+        p, r, n = segments.p1, segments.d, len(segments)
+        rows = max(1, DENSE_CHUNK // max(n, 1))
+        pairs, points = [np.zeros((0, 2), dtype=np.intp)], [np.zeros((0, 2))]
+        for start in range(0, n, rows):
+            block = slice(start, min(start + rows, n))
+            t, u = __class__._intersect(
+                p[block, None], r[block, None], p[None, start:], r[None, start:]
+            )
+            hits = (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+            i, j = np.nonzero(np.triu(hits, 1))
+            pairs.append(np.stack((i + start, j + start), axis=1))
+            points.append(p[i + start] + t[i, j, None] * r[i + start])
+        return np.concatenate(pairs), np.concatenate(points)
+
+
+class _StatusNode:
+    __slots__ = ("seg", "priority", "left", "right", "parent")
+
+    def __init__(self, seg, priority) -> None:
+        self.seg = seg
+        self.priority = priority
+        self.left = self.right = self.parent = None
+
+
+class _SweepStatus:
+    # treap ordered by a comparator that depends on the sweep position,
+    # nodes are removed and stepped through by handle so only inserts compare
+    def __init__(self, seed=0) -> None:
+        self.root = None
+        self.random = np.random.default_rng(seed)
+
+    def _rotate_up(self, node):
+        parent = node.parent
+        grand = parent.parent
+        if parent.left is node:
+            parent.left = node.right
+            if node.right:
+                node.right.parent = parent
+            node.right = parent
+        else:
+            parent.right = node.left
+            if node.left:
+                node.left.parent = parent
+            node.left = parent
+        parent.parent = node
+        node.parent = grand
+        if grand is None:
+            self.root = node
+        elif grand.left is parent:
+            grand.left = node
+        else:
+            grand.right = node
+
+    def insert(self, seg, below):
+        node = _StatusNode(seg, self.random.random())
+        if self.root is None:
+            self.root = node
+            return node
+        current = self.root
+        while True:
+            side = "left" if below(seg, current.seg) else "right"
+            child = getattr(current, side)
+            if child is None:
+                setattr(current, side, node)
+                node.parent = current
+                break
+            current = child
+        while node.parent is not None and node.priority < node.parent.priority:
+            self._rotate_up(node)
+        return node
+
+    def remove(self, node):
+        # rotate the node down to a leaf, then unlink it
+        while node.left or node.right:
+            if node.right is None or (
+                node.left and node.left.priority < node.right.priority
+            ):
+                self._rotate_up(node.left)
+            else:
+                self._rotate_up(node.right)
+        parent = node.parent
+        if parent is None:
+            self.root = None
+        elif parent.left is node:
+            parent.left = None
+        else:
+            parent.right = None
+        node.parent = None
+
+    @staticmethod
+    def next(node):
+        if node.right:
+            node = node.right
+            while node.left:
+                node = node.left
+            return node
+        while node.parent and node.parent.right is node:
+            node = node.parent
+        return node.parent
+
+    @staticmethod
+    def prev(node):
+        if node.left:
+            node = node.left
+            while node.right:
+                node = node.right
+            return node
+        while node.parent and node.parent.left is node:
+            node = node.parent
+        return node.parent
+
+    def lower_bound(self, at_least):
+        # leftmost node whose segment satisfies at_least, which must be
+        # monotone along the order
+        found, node = None, self.root
+        while node:
+            if at_least(node.seg):
+                found, node = node, node.left
+            else:
+                node = node.right
+        return found
+
+    def last(self):
+        node = self.root
+        while node and node.right:
+            node = node.right
+        return node
+
+
+def sweep_intersections(p1, p2, eps=1e-9):
+    # Bentley-Ottmann sweep from left to right over segments given as (N, 2)
+    # start and end points. events are kept in a heap and the segments
+    # crossing the sweep line in a treap. returns the (K, 2) intersecting
+    # index pairs (i < j) and their (K, 2) points. eps only widens the search,
+    # pairs are reported by the exact test of segment_segment, so parallel
+    # and collinear overlapping segments miss there as well
+    p1 = np.asarray(p1, dtype=float).reshape(-1, 2)
+    p2 = np.asarray(p2, dtype=float).reshape(-1, 2)
+    given = list(zip(p1.tolist(), p2.tolist()))
+    scale = max(1.0, float(np.abs(p1).max(initial=0)), float(np.abs(p2).max(initial=0)))
+    eps *= scale
+
+    # endpoints within eps of each other become one event point. a node
+    # shared by several segments often differs in the last bits between
+    # them, as separate events the segments ending there would leave the
+    # sweep before the ones starting there arrive
+    canonical, window, first = {}, [], 0
+    for point in sorted(set(map(tuple, p1.tolist() + p2.tolist()))):
+        while first < len(window) and window[first][0] < point[0] - eps:
+            first += 1
+        for kept in window[first:]:
+            if abs(kept[1] - point[1]) <= eps:
+                canonical[point] = kept
+                break
+        else:
+            canonical[point] = point
+            window.append(point)
+    left, right = [], []
+    for start, end in given:
+        start, end = canonical[tuple(start)], canonical[tuple(end)]
+        left.append(min(start, end))
+        right.append(max(start, end))
+
+    slopes = []
+    for (x1, y1), (x2, y2) in zip(left, right):
+        slopes.append((y2 - y1) / (x2 - x1) if x2 - x1 > eps else math.inf)
+
+    sweep = [0.0, 0.0]
+
+    def y_at(i):
+        x1, y1 = left[i]
+        slope = slopes[i]
+        if slope == math.inf:
+            # vertical segments sit at the current event while the sweep
+            # moves along them
+            return min(max(sweep[1], y1), right[i][1])
+        return y1 + (sweep[0] - x1) * slope
+
+    def below(a, b):
+        ya, yb = y_at(a), y_at(b)
+        if abs(ya - yb) > eps:
+            return ya < yb
+        if slopes[a] != slopes[b]:
+            return slopes[a] < slopes[b]
+        return a < b
+
+    def intersection(a, b):
+        (ax, ay), (bx, by) = left[a], left[b]
+        rx, ry = right[a][0] - ax, right[a][1] - ay
+        sx, sy = right[b][0] - bx, right[b][1] - by
+        denom = rx * sy - ry * sx
+        if denom == 0:
+            return None
+        qx, qy = bx - ax, by - ay
+        t = (qx * sy - qy * sx) / denom
+        u = (qx * ry - qy * rx) / denom
+        if -eps <= t <= 1 + eps and -eps <= u <= 1 + eps:
+            return ax + t * rx, ay + t * ry
+        return None
+
+    queue, queued = [], set()
+    starts = {}
+
+    def push(point):
+        if point not in queued:
+            queued.add(point)
+            heapq.heappush(queue, point)
+
+    for i, (start, end) in enumerate(zip(left, right)):
+        starts.setdefault(start, []).append(i)
+        push(start)
+        push(end)
+
+    status = _SweepStatus()
+    nodes = {}
+    scheduled = set()
+    found = {}
+
+    def schedule(a, b, px, py):
+        key = (a, b) if a < b else (b, a)
+        if key in scheduled:
+            return
+        point = intersection(a, b)
+        if point is None:
+            return
+        # a crossing within eps of an endpoint shares that endpoint's event,
+        # otherwise segments ending there would leave at the crossing and
+        # miss the ones starting there
+        for end in (left[a], right[a], left[b], right[b]):
+            if abs(end[0] - point[0]) <= eps and abs(end[1] - point[1]) <= eps:
+                point = end
+                break
+        # exact order, a crossing a hair to the right but below the event is
+        # still ahead of the sweep
+        if point > (px, py):
+            scheduled.add(key)
+            push(point)
+
+    while queue:
+        px, py = point = heapq.heappop(queue)
+        queued.discard(point)
+        sweep[0], sweep[1] = px, py
+
+        # segments in the status passing through the event point
+        run = []
+        node = status.lower_bound(lambda i: y_at(i) >= py - eps)
+        while node is not None and y_at(node.seg) <= py + eps:
+            run.append(node.seg)
+            node = status.next(node)
+        upper = starts.pop(point, [])
+
+        involved = run + upper
+        if len(involved) > 1:
+            involved.sort()
+            for k, a in enumerate(involved):
+                for b in involved[k + 1 :]:
+                    if (a, b) not in found:
+                        found[a, b] = scalar.segment_segment(*given[a], *given[b])
+
+        for i in run:
+            status.remove(nodes.pop(i))
+        # segments ending here leave, the rest is reinserted in the order
+        # they have right after the event
+        through = [i for i in run if right[i] > point]
+        inserted = [status.insert(i, below) for i in through + upper]
+        for i, node in zip(through + upper, inserted):
+            nodes[i] = node
+
+        if not inserted:
+            above = status.lower_bound(lambda i: y_at(i) >= py - eps)
+            under = status.prev(above) if above is not None else status.last()
+            if above is not None and under is not None:
+                schedule(under.seg, above.seg, px, py)
+            continue
+
+        # the reinserted segments are contiguous, walk to both ends of the run
+        segs = set(through + upper)
+        lowest = highest = inserted[0]
+        under, above = status.prev(lowest), status.next(highest)
+        while under is not None and under.seg in segs:
+            lowest, under = under, status.prev(under)
+        while above is not None and above.seg in segs:
+            highest, above = above, status.next(above)
+        if under is not None:
+            schedule(under.seg, lowest.seg, px, py)
+        if above is not None:
+            schedule(highest.seg, above.seg, px, py)
+
+    hits = sorted(key for key, point in found.items() if point is not None)
+    pairs = np.array(hits, dtype=np.intp).reshape(-1, 2)
+    points = np.array([found[key] for key in hits], dtype=float).reshape(-1, 2)
+    return pairs, points
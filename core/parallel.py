@@ -0,0 +1,176 @@
+# narrow phase sharded over a pool of workers. packed polygon arrays live in
+# shared memory, workers attach to them by name so only pair indices and
+# results cross the process boundary
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from . import np
+from .contacts import ContactBuffer
+from .polygons import (
+    PolygonPack,
+    SimpleConvexPolygonCollisions,
+    pack_polygons,
+    pair_indices,
+)
+
+_FIELDS = PolygonPack.__slots__
+
+
+def _open_block(name):
+    # pool workers share the parent's resource tracker, which already knows
+    # the block. newer pythons can skip registering it a second time
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedPolygonPack:
+    # a PolygonPack copied into shared memory blocks, spec is the picklable
+    # description workers attach with
+    def __init__(self, pack: PolygonPack) -> None:
+        self.blocks = []
+        self.spec = []
+        views = []
+        for field in _FIELDS:
+            array = getattr(pack, field)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            view = np.ndarray(array.shape, array.dtype, buffer=block.buf)
+            view[...] = array
+            self.blocks.append(block)
+            self.spec.append((block.name, array.shape, array.dtype.str))
+            views.append(view)
+        self.spec = tuple(self.spec)
+        self.pack = PolygonPack(*views)
+
+    def fits(self, pack: PolygonPack):
+        return all(
+            getattr(pack, field).shape == getattr(self.pack, field).shape
+            for field in _FIELDS
+        )
+
+    def write(self, pack: PolygonPack):
+        # new poses of the same polygons are written in place, the workers
+        # keep their attachments
+        for field in _FIELDS:
+            getattr(self.pack, field)[...] = getattr(pack, field)
+
+    def close(self):
+        # views into the blocks have to go before the blocks can close
+        self.pack = None
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+# worker side, the pack of the last spec seen stays attached
+_attached = {}
+
+
+def _attach(spec):
+    if spec not in _attached:
+        for blocks, _ in _attached.values():
+            for block in blocks:
+                block.close()
+        _attached.clear()
+        blocks = [_open_block(name) for name, _, _ in spec]
+        views = [
+            np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+            for block, (_, shape, dtype) in zip(blocks, spec)
+        ]
+        _attached[spec] = blocks, PolygonPack(*views)
+    return _attached[spec][1]
+
+
+def _sat_shard(pack, idx1, idx2, contacts):
+    buffer = ContactBuffer(max(len(idx1), 1)) if contacts else None
+    hits, normals, depths = SimpleConvexPolygonCollisions.SAT_batch(
+        pack, idx1, idx2, buffer
+    )
+    if buffer is None:
+        return hits, normals, depths, None
+    n = buffer.count
+    found = (
+        buffer.pair[:n].copy(),
+        buffer.point[:n].copy(),
+        buffer.normal[:n].copy(),
+        buffer.penetration[:n].copy(),
+    )
+    return hits, normals, depths, found
+
+
+def _sat_shared(spec, idx1, idx2, contacts):
+    return _sat_shard(_attach(spec), idx1, idx2, contacts)
+
+
+class ParallelNarrowPhase:
+    # SAT_batch split into one shard of pairs per worker. processes share
+    # the packed polygons through shared memory, threads use them directly
+    # and rely on numpy releasing the GIL. results come back in pair order
+    def __init__(self, workers=4, threads=False) -> None:
+        self.workers = workers
+        self.threads = threads
+        if threads:
+            self.executor = ThreadPoolExecutor(workers)
+        else:
+            self.executor = ProcessPoolExecutor(workers)
+        self.shared = None
+
+    def share(self, pack: PolygonPack):
+        if self.threads:
+            return pack
+        if self.shared is not None and self.shared.fits(pack):
+            self.shared.write(pack)
+        else:
+            if self.shared is not None:
+                self.shared.close()
+            self.shared = SharedPolygonPack(pack)
+        return self.shared.spec
+
+    def SAT_batch(self, pack: PolygonPack, idx1, idx2, buffer=None):
+        # same results as SimpleConvexPolygonCollisions.SAT_batch
+        idx1 = np.asarray(idx1, dtype=np.intp)
+        idx2 = np.asarray(idx2, dtype=np.intp)
+        shared = self.share(pack)
+        work = _sat_shard if self.threads else _sat_shared
+        bounds = np.linspace(0, len(idx1), self.workers + 1).astype(np.intp)
+        futures = [
+            self.executor.submit(
+                work, shared, idx1[lo:hi], idx2[lo:hi], buffer is not None
+            )
+            for lo, hi in zip(bounds[:-1], bounds[1:])
+        ]
+        # gathered in submission order, so the output doesn't depend on
+        # which worker finishes first
+        shards = [future.result() for future in futures]
+        hits = np.concatenate([shard[0] for shard in shards])
+        normals = np.concatenate([shard[1] for shard in shards])
+        depths = np.concatenate([shard[2] for shard in shards])
+        if buffer is not None:
+            for lo, (*_, (pair, point, normal, penetration)) in zip(bounds, shards):
+                buffer.extend(pair + lo, point, normal, penetration)
+        return hits, normals, depths
+
+    def polygon_polygon_SAT_batch(self, pairs, buffer=None):
+        polygons, idx = pair_indices(pairs)
+        if not polygons:
+            return np.zeros(0, dtype=bool), np.zeros((0, 2)), np.zeros(0)
+        pack = pack_polygons(polygons)
+        return self.SAT_batch(pack, idx[:, 0], idx[:, 1], buffer)
+
+    def close(self):
+        self.executor.shutdown()
+        if self.shared is not None:
+            self.shared.close()
+            self.shared = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        kind = "threads" if self.threads else "processes"
+        return f"<ParallelNarrowPhase workers={self.workers} {kind}>"
@@ -1,16 +1,116 @@
 from .lines import LineCollisions
 from ._types import Collision
 from ._types import SimpleConvexPolygon, Line, LineSegment
-from . import logger, np
+from . import logger, np, math, scalar
+from .gjk import gjk, epa, simplex_cache
+from .contacts import contact_cache
+from .profiling import profiler
+from time import perf_counter
 from .auxiliary import (
-    min_max,
-    ranges_overlap,
     range_length,
-    are_collinear,
-    overlap_range,
+    project,
+    cross2,
+    circles_overlap,
+    canonical_axes,
+    ragged_rows,
 )
 
 
+# from this many sides on point queries use the wedge search, single points
+# run it on floats
+WEDGE_SIDES = 32
+# below these many sides single tests run on floats, see core.scalar. the
+# values are the crossovers measured by benchmarks.py crossover, a point test
+# is one pass over the sides so floats stay ahead much longer than for SAT
+SCALAR_SIDES = 12
+SCALAR_POINT_SIDES = WEDGE_SIDES
+
+
+class PolygonPack:
+    # polygons stacked into padded (P, width, 2) arrays for the batch kernels,
+    # short rows repeat their first vertex and carry zero axes
+    __slots__ = ("vertices", "counts", "axes", "axis_counts", "centers", "radii")
+
+    def __init__(self, vertices, counts, axes, axis_counts, centers, radii) -> None:
+        self.vertices = vertices
+        self.counts = counts
+        self.axes = axes
+        self.axis_counts = axis_counts
+        self.centers = centers
+        self.radii = radii
+
+    def __len__(self):
+        return len(self.counts)
+
+
+def pack_polygons(polygons):
+    counts = np.array([poly.sides for poly in polygons], dtype=np.intp)
+    axis_counts = np.array([len(poly.axes) for poly in polygons], dtype=np.intp)
+    width = counts.max() if len(counts) else 0
+    axis_width = axis_counts.max() if len(counts) else 0
+    vertices = np.empty((len(polygons), width, 2))
+    axes = np.zeros((len(polygons), axis_width, 2))
+    centers = np.empty((len(polygons), 2))
+    radii = np.array([poly.radius for poly in polygons], dtype=float)
+    for k, poly in enumerate(polygons):
+        n = poly.sides
+        vertices[k, :n] = poly.vertices
+        vertices[k, n:] = poly.vertices[0]
+        axes[k, : axis_counts[k]] = poly.axes
+        centers[k] = poly.center
+    return PolygonPack(vertices, counts, axes, axis_counts, centers, radii)
+
+
+def ring_records(polygon, dtype=float):
+    # (sides, 4) x, y, nx, ny along the counter clockwise ring, normal k
+    # belongs to the side from vertex k to the next one
+    if polygon.ring is None:
+        raise ValueError(f"{polygon!r} has no single vertex ring")
+    v = polygon.vertices[polygon.ring]
+    d = np.roll(v, -1, axis=0) - v
+    # counter clockwise, so the outward normal is on the right
+    normals = np.stack((d[:, 1], -d[:, 0]), axis=1)
+    normals /= np.hypot(d[:, 0], d[:, 1])[:, None]
+    return np.hstack((v, normals)).astype(dtype)
+
+
+def pack_records(records, starts, counts):
+    # a PolygonPack straight from ragged ring records, in their precision.
+    # every side normal becomes an axis, parallel ones are just repeated
+    counts = np.asarray(counts, dtype=np.intp)
+    rows, owner, local = ragged_rows(starts, counts)
+    data = np.asarray(records[rows])
+    k = len(counts)
+    width = int(counts.max()) if k else 0
+    firsts = np.cumsum(counts) - counts
+    vertices = np.empty((k, width, 2), dtype=data.dtype)
+    vertices[:] = data[firsts, None, :2]
+    vertices[owner, local] = data[:, :2]
+    axes = np.zeros((k, width, 2), dtype=data.dtype)
+    axes[owner, local] = canonical_axes(data[:, 2:])
+    # the vertex mean is inside any convex polygon
+    centers = np.stack([np.bincount(owner, data[:, c], k) for c in (0, 1)], axis=1)
+    centers /= np.maximum(counts, 1)[:, None]
+    reach = np.hypot(*(data[:, :2] - centers[owner]).T)
+    radii = np.maximum.reduceat(reach, firsts) if len(reach) else np.zeros(k)
+    return PolygonPack(vertices, counts, axes, counts.copy(), centers, radii)
+
+
+def pair_indices(pairs):
+    # distinct polygons of the pairs and a (K, 2) array of their positions
+    index = {}
+    polygons = []
+    idx = np.empty((len(pairs), 2), dtype=np.intp)
+    for k, pair in enumerate(pairs):
+        for side, poly in enumerate(pair):
+            key = id(poly)
+            if key not in index:
+                index[key] = len(polygons)
+                polygons.append(poly)
+            idx[k, side] = index[key]
+    return polygons, idx
+
+
 class SimpleConvexPolygonCollisions:
     EDGE_TO_EDGE = 0
     POINT_TO_EDGE = 1
@@ -18,17 +118,72 @@ class SimpleConvexPolygonCollisions:
 
     @staticmethod
     def polygon_point(polygon: SimpleConvexPolygon, point):
-        for i, ls in enumerate(polygon.segments):
-            p1 = ls.p1
-            outnormal = polygon.outnormals[i]
-            p1top = point - p1
-            if p1top.dot(outnormal) > 0:
-                return Collision(False)
+        search = polygon.geometry._ring_search
+        if polygon.sides >= WEDGE_SIDES and search is not None:
+            # the point goes into the local frame instead of every vertex
+            # into the world, the search then stays O(log n)
+            (x, y), (px, py) = scalar.xy(point), polygon.position.tolist()
+            dx, dy = x - px, y - py
+            c, s = math.cos(polygon.angle), math.sin(polygon.angle)
+            local = dx * c - dy * s, dx * s + dy * c
+            return Collision(scalar.polygon_point_wedge(search[2], local))
+        if polygon.sides < SCALAR_POINT_SIDES:
+            return Collision(
+                scalar.polygon_point(
+                    polygon.vertices.tolist(),
+                    polygon.normals.tolist(),
+                    polygon.side_indices,
+                    scalar.xy(point),
+                )
+            )
+        inside = __class__.polygon_points(polygon, np.reshape(point, (1, 2)))
+        return Collision(bool(inside[0]))
+
+    @staticmethod
+    def polygon_points(polygon: SimpleConvexPolygon, points):
+        # (M,) mask of the points inside or on the polygon. big polygons go
+        # through the wedge search, small ones test every side at once
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if polygon.sides >= WEDGE_SIDES and polygon.ring is not None:
+            return __class__.polygon_points_wedge(polygon, points)
+        indices = np.array(polygon.side_indices, dtype=np.intp).reshape(-1, 2)
+        v1 = polygon.vertices[indices[:, 0]]
+        normals = polygon.normals
+        # (p - v1) . n for every point and side
+        offsets = project(points, normals) - np.einsum("ij,ij->i", v1, normals)
+        return (offsets <= 0).all(axis=1)
 
-        return Collision(True)
+    @staticmethod
+    def polygon_points_wedge(polygon: SimpleConvexPolygon, points):
+        # O(log n) per point: binary search for the wedge around the first
+        # vertex holding the point, then one test against its far side
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        ring = polygon.vertices[polygon.ring]
+        n = len(ring)
+        origin = ring[0]
+        rel = points - origin
+        spokes = ring - origin
+        inside = (cross2(spokes[1], rel) >= 0) & (cross2(spokes[-1], rel) <= 0)
+        # largest i in [1, n - 2] with the point left of spoke i
+        lo = np.ones(len(points), dtype=np.intp)
+        hi = np.full(len(points), n - 2, dtype=np.intp)
+        while (lo < hi).any():
+            mid = (lo + hi + 1) // 2
+            left = cross2(spokes[mid], rel) >= 0
+            lo = np.where(left, mid, lo)
+            hi = np.where(left, hi, mid - 1)
+        a, b = ring[lo], ring[lo + 1]
+        inside &= cross2(b - a, points - a) >= 0
+        return inside
 
     @staticmethod
     def polygon_line(polygon: SimpleConvexPolygon, line: Line):
+        # a line farther from the center than the bounding radius misses
+        offset = cross2(polygon.position - line.known_point, line.direction)
+        if abs(offset) > polygon.radius:
+            if profiler.enabled:
+                profiler.count("line_rejected_circle")
+            return Collision(False)
         intersections = []
         for ls in polygon.segments:
             intersection = LineCollisions.segment_line(ls, line)
@@ -38,49 +193,288 @@ class SimpleConvexPolygonCollisions:
 
     @staticmethod
     def polygon_polygon_SAT(poly1: SimpleConvexPolygon, poly2: SimpleConvexPolygon):
-        polygons = poly1, poly2
-        data = []
+        return __class__._SAT_decide(poly1, poly2)[0]
 
-        for n in poly1.outnormals + poly2.outnormals:
-            for *_, n_ in data:
-                if are_collinear(n, n_):
-                    break
-            else:
-                extremes = []
-                for poly in polygons:
-                    products = [n.dot(p) for p in poly.points]
-                    extremes.append(min_max(products))
-                if ranges_overlap(extremes):
-                    data.append([overlap_range(*extremes), n])
-                else:
-                    return Collision(False)
-
-        details = __class__.SAT_details(data, poly1, poly2)
+    @staticmethod
+    def _SAT_decide(poly1, poly2):
+        # the collision and the axis that decided it: a separating axis for
+        # misses, the contact normal for hits. axes of misses aren't unit
+        if poly1.sides < SCALAR_SIDES and poly2.sides < SCALAR_SIDES:
+            return __class__._SAT_decide_scalar(poly1, poly2)
+        profiling = profiler.enabled
+        if profiling:
+            profiler.count("sat_pairs")
+        if not circles_overlap(
+            poly1.position, poly1.radius, poly2.position, poly2.radius
+        ):
+            if profiling:
+                profiler.count("sat_rejected_circle")
+            # the bounding circles are apart along the line of centers
+            return Collision(False), poly2.position - poly1.position
+        axes, lower, upper = __class__._SAT_overlaps(poly1, poly2)
+        if profiling:
+            # all axes are projected in one call, there is no earlier exit
+            profiler.count("sat_axes", len(axes))
+        gaps = upper - lower
+        if (gaps < 0).any():
+            if profiling:
+                profiler.count("sat_rejected_axis")
+            return Collision(False), axes[gaps.argmin()]
+        collision = __class__._SAT_contact(poly1, poly2, axes, lower, upper)
+        return collision, collision.details["normal"]
+
+    @staticmethod
+    def _SAT_decide_scalar(poly1, poly2):
+        # _SAT_decide on floats, it can stop at the first separating axis
+        profiling = profiler.enabled
+        if profiling:
+            profiler.count("sat_pairs")
+        c1, c2 = poly1.position.tolist(), poly2.position.tolist()
+        if not scalar.circles_overlap(c1, poly1.radius, c2, poly2.radius):
+            if profiling:
+                profiler.count("sat_rejected_circle")
+            return Collision(False), poly2.position - poly1.position
+        axes = poly1.axes.tolist() + poly2.axes.tolist()
+        k, lower, upper = scalar.SAT_axis(
+            poly1.vertices.tolist(), poly2.vertices.tolist(), axes
+        )
+        if upper < lower:
+            if profiling:
+                profiler.count("sat_axes", k + 1)
+                profiler.count("sat_rejected_axis")
+            return Collision(False), np.array(axes[k])
+        if profiling:
+            profiler.count("sat_axes", len(axes))
+        (ax, ay), (dx, dy) = axes[k], (c2[0] - c1[0], c2[1] - c1[1])
+        if ax * dx + ay * dy < 0:
+            pnormal, min_range = np.array((-ax, -ay)), (-upper, -lower)
+        else:
+            pnormal, min_range = np.array((ax, ay)), (lower, upper)
+        details = __class__.SAT_details([[min_range, pnormal]], poly1, poly2)
+        return Collision(True, details), pnormal
+
+    @staticmethod
+    def _separated_on(poly1, poly2, axis):
+        proj1 = poly1.vertices.dot(axis)
+        proj2 = poly2.vertices.dot(axis)
+        return proj1.max() < proj2.min() or proj2.max() < proj1.min()
+
+    @staticmethod
+    def polygon_polygon_SAT_cached(
+        poly1: SimpleConvexPolygon, poly2: SimpleConvexPolygon, cache=contact_cache
+    ):
+        # SAT across frames: unchanged pairs reuse their last result and
+        # moved ones try the axis that decided it before projecting them all
+        entry = cache.get(poly1, poly2)
+        if entry is not None:
+            collision = cache.reuse(entry, poly1, poly2)
+            if collision is not None:
+                if profiler.enabled:
+                    profiler.count("contact_cache_reused")
+                return collision
+            if __class__._separated_on(poly1, poly2, entry.axis):
+                if profiler.enabled:
+                    profiler.count("contact_cache_axis_rejected")
+                collision = Collision(False)
+                cache.store(poly1, poly2, collision, entry.axis)
+                return collision
+        if profiler.enabled:
+            profiler.count("contact_cache_misses")
+        collision, axis = __class__._SAT_decide(poly1, poly2)
+        cache.store(poly1, poly2, collision, axis)
+        return collision
+
+    @staticmethod
+    def _SAT_overlaps(poly1, poly2):
+        # both shapes keep their unique axes cached, so the candidate axes are
+        # one concatenation. small polygons project every vertex in one call,
+        # big convex ones find their extremes by binary search
+        axes = np.concatenate((poly1.axes, poly2.axes))
+        lower1, upper1 = poly1.projection_range(axes)
+        lower2, upper2 = poly2.projection_range(axes)
+        return axes, np.maximum(lower1, lower2), np.minimum(upper1, upper2)
+
+    @staticmethod
+    def _SAT_contact(poly1, poly2, axes, lower, upper):
+        best = (upper - lower).argmin()
+        pnormal, min_range = axes[best], (lower[best], upper[best])
+        # report the normal pointing from poly1 towards poly2
+        if pnormal.dot(poly2.center - poly1.center) < 0:
+            pnormal, min_range = -pnormal, (-min_range[1], -min_range[0])
+        details = __class__.SAT_details([[min_range, pnormal]], poly1, poly2)
         return Collision(True, details)
 
     @staticmethod
-    def polygon_polygon_GJK(poly1: SimpleConvexPolygon, poly2: SimpleConvexPolygon):
-        pass
+    def SAT_batch(pack: PolygonPack, idx1, idx2, buffer=None):
+        # vectorized SAT over packed polygons, pair k tests idx1[k] against
+        # idx2[k], returns hit flags, minimum overlap normals and their depths.
+        # with a ContactBuffer the hits are also written into it, using the
+        # deepest vertex of the second polygon as contact point
+        idx1, idx2 = np.asarray(idx1, dtype=np.intp), np.asarray(idx2, dtype=np.intp)
+        hits = np.zeros(len(idx1), dtype=bool)
+        pnormals = np.zeros((len(idx1), 2))
+        depths = np.zeros(len(idx1))
+        # pairs whose bounding circles miss never reach the projections
+        towards = pack.centers[idx2] - pack.centers[idx1]
+        reach = pack.radii[idx1] + pack.radii[idx2]
+        near = np.flatnonzero(np.einsum("ij,ij->i", towards, towards) <= reach * reach)
+        if profiler.enabled:
+            profiler.count("sat_pairs", len(idx1))
+            profiler.count("sat_rejected_circle", len(idx1) - len(near))
+        if not len(near):
+            return hits, pnormals, depths
+        idx1, idx2, towards = idx1[near], idx2[near], towards[near]
+
+        v1, v2 = pack.vertices[idx1], pack.vertices[idx2]
+        axes = np.concatenate((pack.axes[idx1], pack.axes[idx2]), axis=1)
+        slots = np.arange(pack.axes.shape[1])
+        valid = np.concatenate(
+            (
+                slots < pack.axis_counts[idx1][:, None],
+                slots < pack.axis_counts[idx2][:, None],
+            ),
+            axis=1,
+        )
+
+        ax, ay = axes[:, :, None, 0], axes[:, :, None, 1]
+        proj1 = v1[:, None, :, 0] * ax + v1[:, None, :, 1] * ay
+        proj2 = v2[:, None, :, 0] * ax + v2[:, None, :, 1] * ay
+        lower = np.maximum(proj1.min(axis=2), proj2.min(axis=2))
+        upper = np.minimum(proj1.max(axis=2), proj2.max(axis=2))
+        overlaps = np.where(valid, upper - lower, np.inf)
+
+        near_hits = (overlaps >= 0).all(axis=1)
+        if profiler.enabled:
+            profiler.count("sat_axes", int(valid.sum()))
+            profiler.count("sat_rejected_axis", len(near) - int(near_hits.sum()))
+        best = overlaps.argmin(axis=1)
+        rows = np.arange(len(best))
+        near_normals = axes[rows, best]
+        flip = np.einsum("ij,ij->i", near_normals, towards) < 0
+        near_normals[flip] *= -1
+        hit_rows = np.flatnonzero(near_hits)
+        hits[near[hit_rows]] = True
+        pnormals[near[hit_rows]] = near_normals[hit_rows]
+        depths[near[hit_rows]] = overlaps[hit_rows, best[hit_rows]]
+        if buffer is not None:
+            hit_vertices = v2[hit_rows]
+            deepest = np.einsum(
+                "kvd,kd->kv", hit_vertices, near_normals[hit_rows]
+            ).argmin(axis=1)
+            buffer.extend(
+                near[hit_rows],
+                hit_vertices[np.arange(len(hit_rows)), deepest],
+                near_normals[hit_rows],
+                depths[near[hit_rows]],
+            )
+        return hits, pnormals, depths
+
+    @staticmethod
+    def polygon_polygon_SAT_batch(pairs, buffer=None):
+        # pairs is a sequence of (poly1, poly2), every polygon is packed once.
+        # contacts written to buffer refer to the pairs by their position
+        polygons, idx = pair_indices(pairs)
+        if not polygons:
+            return np.zeros(0, dtype=bool), np.zeros((0, 2)), np.zeros(0)
+        pack = pack_polygons(polygons)
+        return __class__.SAT_batch(pack, idx[:, 0], idx[:, 1], buffer)
+
+    @staticmethod
+    def polygon_polygon_SAT_many(pairs):
+        # the batch kernel sorts out the misses, only hits get full details
+        hits, _, _ = __class__.polygon_polygon_SAT_batch(pairs)
+        return [
+            __class__._SAT_contact(*pair, *__class__._SAT_overlaps(*pair))
+            if hit
+            else Collision(False)
+            for pair, hit in zip(pairs, hits)
+        ]
+
+    @staticmethod
+    def polygon_polygon_GJK(
+        poly1: SimpleConvexPolygon, poly2: SimpleConvexPolygon, cache=simplex_cache
+    ):
+        profiling = profiler.enabled
+        if profiling:
+            profiler.count("gjk_pairs")
+        if not circles_overlap(
+            poly1.position, poly1.radius, poly2.position, poly2.radius
+        ):
+            if profiling:
+                profiler.count("gjk_rejected_circle")
+            return Collision(False)
+        directions = cache.get(poly1, poly2) if cache is not None else None
+        result = gjk(poly1, poly2, directions)
+        if cache is not None:
+            cache.store(poly1, poly2, result)
+        if profiling:
+            profiler.count("gjk_iterations", result.iterations)
+        if not result.overlap:
+            return Collision(False)
+        pnormal, depth, face = epa(poly1, poly2, result.simplex)
+        return Collision(True, __class__.GJK_details(pnormal, depth, face))
+
+    @staticmethod
+    def GJK_details(pnormal, depth, face):
+        # the same details as SAT_details, read off the closest EPA edge
+        # instead of projecting both polygons again. the edge's endpoints
+        # carry the supporting vertices of both polygons, a polygon whose two
+        # are the same touches with a vertex, otherwise with a side
+        details = {
+            "point": None,
+            "normal": pnormal,
+            "collision_structures": [],
+            "penetration_vector": depth * pnormal,
+        }
+        if face is None:
+            return details
+        (_, a1, b1, _), (_, a2, b2, _) = face
+        # listed lower bound first as in SAT_details, which is poly2's side
+        for p, q in ((b1, b2), (a1, a2)):
+            if np.array_equal(p, q):
+                details["collision_structures"].append(p.copy())
+                if details["point"] is None:
+                    details["point"] = p.copy()
+            else:
+                details["collision_structures"].append(LineSegment(p, q))
+        return details
+
+    @staticmethod
+    def polygon_polygon_distance(
+        poly1: SimpleConvexPolygon, poly2: SimpleConvexPolygon, cache=simplex_cache
+    ):
+        directions = cache.get(poly1, poly2) if cache is not None else None
+        result = gjk(poly1, poly2, directions)
+        if cache is not None:
+            cache.store(poly1, poly2, result)
+        return Collision(
+            result.overlap,
+            {"distance": result.distance, "points": result.points},
+        )
 
     # decided to separate calculating other properties of the collision
     @staticmethod
     def SAT_details(data: list, poly1, poly2):
+        profiling = profiler.enabled
+        if profiling:
+            profiler.count("manifolds")
+            start = perf_counter()
         min_overlap = min(data, key=lambda d: range_length(d[0]))
         min_range, pnormal = min_overlap
         collision_structures = []
-        products1 = [pnormal.dot(p) for p in poly1.points]
-        products2 = [pnormal.dot(p) for p in poly2.points]
+        products1 = poly1.vertices.dot(pnormal)
+        products2 = poly2.vertices.dot(pnormal)
         for d in min_range:
-            pack = (products1, poly1) if d in products1 else (products2, poly2)
+            # the bound comes from whichever polygon has a vertex there
+            closer = np.abs(products1 - d).min() <= np.abs(products2 - d).min()
+            pack = (products1, poly1) if closer else (products2, poly2)
             products, poly = pack
-            indices = [
-                idx for idx, d_ in enumerate(products) if np.isclose(d_, d, 0.01)
-            ]
+            indices = np.flatnonzero(np.isclose(products, d, 0.01))
             if len(indices) == 2:
                 points = map(lambda idx: poly.points[idx], indices)
                 collision_structures.append(LineSegment(*points))
             else:
-                collision_structures.append(poly.points[indices[0]])
+                collision_structures.append(poly.points[indices[0]].copy())
 
         s1, s2 = collision_structures
         t1, t2 = type(s1), type(s2)
@@ -89,20 +483,18 @@ class SimpleConvexPolygonCollisions:
         else:
             cpoint = s1 if t2 is LineSegment else s2
 
-        return {
+        details = {
             "point": cpoint,
             "normal": pnormal,
             "collision_structures": collision_structures,
             "penetration_vector": range_length(min_range) * pnormal,
         }
+        if profiling:
+            profiler.add_time("SAT_details", perf_counter() - start)
+        return details
 
     @staticmethod
     def polygon_polygon_points(poly1: SimpleConvexPolygon, poly2: SimpleConvexPolygon):
-        points = [[], []]
-        for p1 in poly1.points:
-            if __class__.polygon_point(poly2, p1):
-                points[0].append(p1)
-        for p2 in poly2.points:
-            if __class__.polygon_point(poly1, p2):
-                points[1].append(p2)
-        return points
+        inside1 = __class__.polygon_points(poly2, poly1.points)
+        inside2 = __class__.polygon_points(poly1, poly2.points)
+        return [list(poly1.points[inside1].copy()), list(poly2.points[inside2].copy())]
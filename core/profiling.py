@@ -0,0 +1,87 @@
+# opt-in counters and per phase timers. hot paths check profiler.enabled
+# before touching anything, so while it is off they cost one attribute read
+
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+from . import logger
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name) -> None:
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.timers[self.name] += perf_counter() - self.start
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_no_phase = _NoPhase()
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self.enabled = False
+        self.counters = defaultdict(int)
+        # cumulative seconds per phase
+        self.timers = defaultdict(float)
+
+    def count(self, name, k=1):
+        self.counters[name] += k
+
+    def add_time(self, name, seconds):
+        self.timers[name] += seconds
+
+    def phase(self, name):
+        # times the with block, a shared no-op while disabled
+        return _Phase(self, name) if self.enabled else _no_phase
+
+    def reset(self):
+        self.counters.clear()
+        self.timers.clear()
+
+    def snapshot(self):
+        return {"counters": dict(self.counters), "timers": dict(self.timers)}
+
+    def log(self):
+        for name, value in sorted(self.counters.items()):
+            logger.debug(f"{name}: {value}")
+        for name, seconds in sorted(self.timers.items()):
+            logger.debug(f"{name}: {seconds * 1000:.3f} ms")
+
+    def __repr__(self):
+        state = "enabled" if self.enabled else "disabled"
+        counters, timers = len(self.counters), len(self.timers)
+        return f"<Profiler {state} counters={counters} timers={timers}>"
+
+
+profiler = Profiler()
+
+
+@contextmanager
+def profiled(reset=True):
+    # with profiled() as stats: ... then stats.snapshot()
+    enabled = profiler.enabled
+    if reset:
+        profiler.reset()
+    profiler.enabled = True
+    try:
+        yield profiler
+    finally:
+        profiler.enabled = enabled
@@ -0,0 +1,41 @@
+# point queries that go through a broad phase index instead of every body
+
+from . import np
+from ._types import Circle, SimpleConvexPolygon
+from .polygons import SimpleConvexPolygonCollisions
+
+
+def contains_points(structure, points):
+    # (M,) mask, lines and segments have no area and contain nothing
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    if isinstance(structure, SimpleConvexPolygon):
+        return SimpleConvexPolygonCollisions.polygon_points(structure, points)
+    if isinstance(structure, Circle):
+        d = points - structure.center
+        return np.einsum("ij,ij->i", d, d) <= structure.radius * structure.radius
+    return np.zeros(len(points), dtype=bool)
+
+
+def bodies_at(index, point):
+    # bodies containing the point, in the order they were added to the index
+    x, y = point
+    candidates = sorted(index.query((x, y, x, y)), key=lambda b: index.entries[b][0])
+    return [body for body in candidates if contains_points(body, point)[0]]
+
+
+def bodies_at_many(index, points):
+    # one list of bodies per point. each candidate body tests all the points
+    # whose boxes reached it in a single call
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    waiting = {}
+    for k, (x, y) in enumerate(points.tolist()):
+        for body in index.query((x, y, x, y)):
+            waiting.setdefault(body, []).append(k)
+    found = [[] for _ in range(len(points))]
+    for body in sorted(waiting, key=lambda b: index.entries[b][0]):
+        ks = waiting[body]
+        inside = contains_points(body, points[ks])
+        for k, hit in zip(ks, inside.tolist()):
+            if hit:
+                found[k].append(body)
+    return found
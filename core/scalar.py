@@ -0,0 +1,89 @@
+# the same tests on plain floats. for a handful of vertices numpy's per call
+# overhead costs many times the arithmetic, so small shapes take these paths.
+# points are (x, y) pairs, vertex and axis lists come from ndarray.tolist()
+
+from . import np
+
+
+def xy(p):
+    return p.tolist() if type(p) is np.ndarray else p
+
+
+def cross(ux, uy, vx, vy):
+    return ux * vy - uy * vx
+
+
+def polygon_point(vertices, normals, side_indices, point):
+    # inside or on the polygon if the point is behind every side. p.n - v.n
+    # rounds like the numpy version, which matters for points on a side
+    px, py = point
+    for (i, _), (nx, ny) in zip(side_indices, normals):
+        x, y = vertices[i]
+        if px * nx + py * ny - (x * nx + y * ny) > 0:
+            return False
+    return True
+
+
+def polygon_point_wedge(ring, point):
+    # polygon_points_wedge for one point, ring holds the vertices in counter
+    # clockwise order. the same crosses, so points on a side agree
+    px, py = point
+    ox, oy = ring[0]
+    rx, ry = px - ox, py - oy
+    if cross(ring[1][0] - ox, ring[1][1] - oy, rx, ry) < 0:
+        return False
+    if cross(ring[-1][0] - ox, ring[-1][1] - oy, rx, ry) > 0:
+        return False
+    # largest i in [1, n - 2] with the point left of spoke i
+    lo, hi = 1, len(ring) - 2
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if cross(ring[mid][0] - ox, ring[mid][1] - oy, rx, ry) >= 0:
+            lo = mid
+        else:
+            hi = mid - 1
+    (ax, ay), (bx, by) = ring[lo], ring[lo + 1]
+    return cross(bx - ax, by - ay, px - ax, py - ay) >= 0
+
+
+def circles_overlap(c1, r1, c2, r2):
+    dx, dy = c2[0] - c1[0], c2[1] - c1[1]
+    reach = r1 + r2
+    return dx * dx + dy * dy <= reach * reach
+
+
+def SAT_axis(vertices1, vertices2, axes):
+    # (k, lower, upper) for the axis with the least overlap, or for the first
+    # one that separates, which is the one with upper < lower
+    best, best_overlap = None, None
+    for k, (ax, ay) in enumerate(axes):
+        proj1 = [x * ax + y * ay for x, y in vertices1]
+        proj2 = [x * ax + y * ay for x, y in vertices2]
+        lower = max(min(proj1), min(proj2))
+        upper = min(max(proj1), max(proj2))
+        if upper < lower:
+            return k, lower, upper
+        if best is None or upper - lower < best_overlap:
+            best, best_overlap = (k, lower, upper), upper - lower
+    return best
+
+
+def line_point(known_point, direction, point, atol):
+    (x, y), (dx, dy), (px, py) = known_point, direction, point
+    return abs(cross(px - x, py - y, dx, dy)) <= atol
+
+
+def segment_segment(p1, p2, q1, q2):
+    # the intersection point of two segments, None if they miss or are
+    # parallel. both parameters are clamped to the closed segments
+    rx, ry = p2[0] - p1[0], p2[1] - p1[1]
+    sx, sy = q2[0] - q1[0], q2[1] - q1[1]
+    denom = cross(rx, ry, sx, sy)
+    if denom == 0:
+        return None
+    qx, qy = q1[0] - p1[0], q1[1] - p1[1]
+    t = cross(qx, qy, sx, sy) / denom
+    u = cross(qx, qy, rx, ry) / denom
+    if not (0 <= t <= 1 and 0 <= u <= 1):
+        return None
+    return p1[0] + t * rx, p1[1] + t * ry
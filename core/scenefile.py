@@ -0,0 +1,225 @@
+# polygon scenes as one flat binary file, opened with np.memmap so that
+# loading costs a header read and queries run on the mapped arrays without
+# building a SimpleConvexPolygon per body.
+#
+# layout, little endian, sections 64 byte aligned:
+#   header    see HEADER, padded to 64 bytes
+#   records   (V, 4) x, y, nx, ny per vertex, ring order, the normal belongs
+#             to the side from this vertex to the next one
+#   offsets   (P + 1,) int64, polygon k owns records[offsets[k]:offsets[k+1]]
+#   aabbs     (P, 4) min x, min y, max x, max y
+
+import os
+import shutil
+import struct
+import tempfile
+from . import np
+from ._types import SimpleConvexPolygon
+from .auxiliary import ragged_rows, aabb_pairs
+from .polygons import SimpleConvexPolygonCollisions, ring_records, pack_records
+
+MAGIC = b"FCSCENE\0"
+VERSION = 1
+# magic, version, float itemsize, polygons, vertices, records, offsets and
+# aabbs byte positions
+HEADER = struct.Struct("<8sIIQQQQQ")
+ALIGN = 64
+# rows per pass when scanning whole sections, bounds the temporaries
+CHUNK = 1 << 20
+# polygons converted per write by SceneWriter.extend
+WRITE_CHUNK = 4096
+
+
+def _aligned(position):
+    return -(-position // ALIGN) * ALIGN
+
+
+class SceneWriter:
+    # streams polygons into a scene file. records go straight to the file,
+    # offsets and aabbs to temporary files appended on close
+    def __init__(self, path, dtype=np.float64) -> None:
+        self.path = path
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        if self.dtype.kind != "f" or self.dtype.itemsize not in (4, 8):
+            raise ValueError(f"scenes store float32 or float64, not {self.dtype}")
+        self.polygons = 0
+        self.vertices = 0
+        self.file = open(path, "wb")
+        self.file.write(bytes(ALIGN))
+        self._offsets = tempfile.TemporaryFile()
+        self._aabbs = tempfile.TemporaryFile()
+        self._offsets.write(np.zeros(1, dtype="<i8").tobytes())
+
+    def write(self, polygon):
+        self.extend((polygon,))
+
+    def extend(self, polygons):
+        batch = []
+        for polygon in polygons:
+            batch.append(polygon)
+            if len(batch) == WRITE_CHUNK:
+                self._write_batch(batch)
+                batch = []
+        if batch:
+            self._write_batch(batch)
+
+    def _write_batch(self, polygons):
+        records = [ring_records(poly, self.dtype) for poly in polygons]
+        counts = np.array([len(r) for r in records], dtype="<i8")
+        self.file.write(np.concatenate(records).tobytes())
+        offsets = self.vertices + np.cumsum(counts)
+        self._offsets.write(offsets.astype("<i8").tobytes())
+        aabbs = np.array([poly.aabb() for poly in polygons], dtype="<f8")
+        self._aabbs.write(aabbs.tobytes())
+        self.polygons += len(polygons)
+        self.vertices += int(counts.sum())
+
+    def _append(self, source):
+        self.file.write(bytes(_aligned(self.file.tell()) - self.file.tell()))
+        position = self.file.tell()
+        source.seek(0)
+        shutil.copyfileobj(source, self.file)
+        source.close()
+        return position
+
+    def close(self):
+        if self.file.closed:
+            return
+        offsets_at = self._append(self._offsets)
+        aabbs_at = self._append(self._aabbs)
+        self.file.seek(0)
+        self.file.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                self.dtype.itemsize,
+                self.polygons,
+                self.vertices,
+                ALIGN,
+                offsets_at,
+                aabbs_at,
+            )
+        )
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return f"<SceneWriter {self.path!r} polygons={self.polygons}>"
+
+
+def write_scene(path, polygons, dtype=np.float64):
+    with SceneWriter(path, dtype) as writer:
+        writer.extend(polygons)
+    return path
+
+
+class MappedScene:
+    # read only view of a scene file, polygons are referred to by index
+    def __init__(self, path) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+        if len(header) < HEADER.size or header[:8] != MAGIC:
+            raise ValueError(f"{path} is not a scene file")
+        (_, version, itemsize, polygons, vertices, records_at, offsets_at, aabbs_at) = (
+            HEADER.unpack(header)
+        )
+        if version != VERSION:
+            raise ValueError(f"{path} has scene format {version}, not {VERSION}")
+        dtype = {4: "<f4", 8: "<f8"}[itemsize]
+        # np.memmap refuses empty sections
+        self.records = self._map(dtype, records_at, (vertices, 4))
+        self.offsets = self._map("<i8", offsets_at, (polygons + 1,))
+        self.aabbs = self._map("<f8", aabbs_at, (polygons, 4))
+
+    def _map(self, dtype, offset, shape):
+        if not np.prod(shape):
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+    @property
+    def vertices(self):
+        return self.records[:, :2]
+
+    @property
+    def normals(self):
+        return self.records[:, 2:]
+
+    def sides(self, k):
+        return int(self.offsets[k + 1] - self.offsets[k])
+
+    def polygon(self, k):
+        # builds a SimpleConvexPolygon for the rare body that needs one
+        start, end = self.offsets[k], self.offsets[k + 1]
+        n = int(end - start)
+        points = np.array(self.records[start:end, :2], dtype=float)
+        return SimpleConvexPolygon(points, [(i, (i + 1) % n) for i in range(n)])
+
+    def query(self, aabb):
+        # indices of the polygons whose aabbs overlap aabb
+        x1, y1, x2, y2 = aabb
+        found = []
+        for start in range(0, len(self), CHUNK):
+            boxes = self.aabbs[start : start + CHUNK]
+            hit = (
+                (boxes[:, 0] <= x2)
+                & (boxes[:, 2] >= x1)
+                & (boxes[:, 1] <= y2)
+                & (boxes[:, 3] >= y1)
+            )
+            found.append(np.flatnonzero(hit) + start)
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.intp)
+
+    def bodies_at(self, point):
+        # indices of the polygons containing point, edges included
+        px, py = point
+        candidates = self.query((px, py, px, py))
+        if not len(candidates):
+            return candidates
+        starts = self.offsets[candidates]
+        counts = self.offsets[candidates + 1] - starts
+        rows, owner, _ = ragged_rows(starts, counts)
+        x, y, nx, ny = self.records[rows].astype(float).T
+        outside = (px - x) * nx + (py - y) * ny > 0
+        return candidates[np.bincount(owner, outside, len(candidates)) == 0]
+
+    def pack(self, indices):
+        # a PolygonPack of the given polygons for the batch kernels
+        indices = np.asarray(indices, dtype=np.intp)
+        starts = self.offsets[indices]
+        return pack_records(self.records, starts, self.offsets[indices + 1] - starts)
+
+    def candidate_pairs(self):
+        # (idx1, idx2) of every pair with overlapping aabbs
+        return aabb_pairs(self.aabbs)
+
+    def collide(self, idx1, idx2, buffer=None):
+        # SAT_batch over index pairs, only the polygons involved get packed
+        idx1, idx2 = np.asarray(idx1, dtype=np.intp), np.asarray(idx2, dtype=np.intp)
+        involved, inverse = np.unique(np.concatenate((idx1, idx2)), return_inverse=True)
+        pack = self.pack(involved)
+        return SimpleConvexPolygonCollisions.SAT_batch(
+            pack, inverse[: len(idx1)], inverse[len(idx1) :], buffer
+        )
+
+    def close(self):
+        # drops the mappings, the file is unmapped once no views are left
+        self.records = self.offsets = self.aabbs = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.aabbs)
+
+    def __repr__(self):
+        size = os.path.getsize(self.path)
+        return f"<MappedScene {self.path!r} polygons={len(self)} bytes={size}>"
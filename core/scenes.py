@@ -0,0 +1,61 @@
+# seeded scene generators shared by the demo and the benchmarks, the same
+# seed always gives the same scene
+
+from . import np
+from ._types import SimpleConvexPolygon, Line, LineSegment, Circle
+
+SEED = 0
+
+
+def scene_rng(seed=SEED):
+    return np.random.default_rng(seed)
+
+
+def random_polygons(k, extent, rng, sides=(3, 7), radius=(10, 25)):
+    # sides and radius are [low, high) integer ranges
+    polygons = []
+    for _ in range(k):
+        poly = SimpleConvexPolygon.generate_n_polygon(
+            n=int(rng.integers(*sides)),
+            r=float(rng.integers(*radius)),
+            center=rng.random(2) * extent,
+        )
+        polygons.append(poly)
+    return polygons
+
+
+def uneven_polygons(k, extent, rng):
+    # mostly small debris with a few very large bodies
+    polygons = []
+    for _ in range(k):
+        r = 200.0 if rng.random() < 0.02 else float(rng.integers(2, 6))
+        poly = SimpleConvexPolygon.generate_n_polygon(
+            n=int(rng.integers(3, 7)), r=r, center=rng.random(2) * extent
+        )
+        polygons.append(poly)
+    return polygons
+
+
+def random_segments(k, extent, rng, length=30.0):
+    segments = []
+    for _ in range(k):
+        p1 = rng.random(2) * extent
+        segments.append(LineSegment(p1, p1 + rng.normal(size=2) * length))
+    return segments
+
+
+def random_lines(k, extent, rng):
+    return [Line(rng.normal(size=2), rng.random(2) * extent) for _ in range(k)]
+
+
+def random_circles(k, extent, rng, radius=(5, 20)):
+    return [Circle(rng.random(2) * extent, rng.uniform(*radius)) for _ in range(k)]
+
+
+def mixed_scene(n, rng):
+    # constant density, a quarter segments and two lines
+    extent = 40 * n**0.5
+    scene = random_polygons(n - n // 4, extent, rng)
+    scene += random_segments(max(n // 4 - 2, 0), extent, rng)
+    scene += random_lines(min(2, n), extent, rng)
+    return scene
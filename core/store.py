@@ -0,0 +1,291 @@
+# polygons kept as structure of arrays: every body's world space ring
+# records live in one shared (V, 4) array and a body is a slot holding its
+# start and count. bodies are handed out as small handles into the store,
+# removed slots are reused through a free list and the records are
+# compacted once enough of them are garbage
+
+from . import np
+from ._types import SimpleConvexPolygon
+from .auxiliary import ragged_rows, aabb_pairs
+from .polygons import SimpleConvexPolygonCollisions, ring_records, pack_records
+
+
+class PolygonHandle:
+    __slots__ = ("store", "slot", "generation")
+
+    def __init__(self, store, slot, generation) -> None:
+        self.store = store
+        self.slot = slot
+        self.generation = generation
+
+    @property
+    def alive(self):
+        return self.store.generations[self.slot] == self.generation
+
+    @property
+    def vertices(self):
+        # views into the store, valid until the next compaction
+        return self.store.records_of(self)[:, :2]
+
+    @property
+    def normals(self):
+        return self.store.records_of(self)[:, 2:]
+
+    @property
+    def center(self):
+        return self.store.centers[self.store.slot_of(self)]
+
+    @property
+    def sides(self):
+        return int(self.store.counts[self.store.slot_of(self)])
+
+    def aabb(self):
+        return tuple(self.store.aabbs[self.store.slot_of(self)].tolist())
+
+    def translate(self, tvec):
+        self.store.translate_many([self], [tvec])
+
+    def rotate(self, a, point=None):
+        self.store.rotate_many([self], [a], None if point is None else [point])
+
+    def polygon(self):
+        return self.store.polygon(self)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, PolygonHandle)
+            and self.store is other.store
+            and self.slot == other.slot
+            and self.generation == other.generation
+        )
+
+    def __hash__(self):
+        return hash((id(self.store), self.slot, self.generation))
+
+    def __repr__(self):
+        state = "" if self.alive else " removed"
+        return f"<PolygonHandle slot={self.slot}{state}>"
+
+
+class PolygonStore:
+    # float32 halves the records and the batch kernels' bandwidth, the
+    # precision is fine for scenes spanning a few thousand units
+    def __init__(self, capacity=1024, dtype=np.float64, compact_ratio=0.5) -> None:
+        self.dtype = np.dtype(dtype)
+        if self.dtype.kind != "f":
+            raise ValueError(f"PolygonStore holds floats, not {self.dtype}")
+        self.records = np.empty((capacity * 4, 4), dtype=self.dtype)
+        # records in use, removed bodies leave theirs behind until compact
+        self.used = 0
+        self.garbage = 0
+        self.compact_ratio = compact_ratio
+        self.starts = np.zeros(capacity, dtype=np.intp)
+        self.counts = np.zeros(capacity, dtype=np.intp)
+        self.centers = np.zeros((capacity, 2), dtype=self.dtype)
+        self.aabbs = np.zeros((capacity, 4), dtype=self.dtype)
+        self.alive = np.zeros(capacity, dtype=bool)
+        # bumped on removal so old handles of a reused slot are detected
+        self.generations = np.zeros(capacity, dtype=np.int64)
+        self.slots = 0
+        self.free = []
+
+    def _reserve(self, slots, records):
+        if self.slots + slots > len(self.starts):
+            capacity = max(2 * len(self.starts), self.slots + slots)
+            names = ("starts", "counts", "centers", "aabbs", "alive", "generations")
+            for name in names:
+                old = getattr(self, name)
+                new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+                new[: len(old)] = old
+                setattr(self, name, new)
+        if self.used + records > len(self.records):
+            capacity = max(2 * len(self.records), self.used + records)
+            grown = np.empty((capacity, 4), dtype=self.dtype)
+            grown[: self.used] = self.records[: self.used]
+            self.records = grown
+
+    def slot_of(self, handle):
+        if handle.store is not self or not handle.alive:
+            raise KeyError(f"{handle!r} is not in this store")
+        return handle.slot
+
+    def records_of(self, handle):
+        slot = self.slot_of(handle)
+        start = self.starts[slot]
+        return self.records[start : start + self.counts[slot]]
+
+    def _slots(self, handles):
+        return np.array([self.slot_of(h) for h in handles], dtype=np.intp)
+
+    def add(self, polygon):
+        return self.add_many((polygon,))[0]
+
+    def add_many(self, polygons):
+        # copies the polygons' world space rings in, returns their handles
+        records = [ring_records(poly, self.dtype) for poly in polygons]
+        if not records:
+            return []
+        counts = np.array([len(r) for r in records], dtype=np.intp)
+        self._reserve(max(len(records) - len(self.free), 0), int(counts.sum()))
+        slots = [self.free.pop() if self.free else self._next_slot() for _ in records]
+        slots = np.array(slots, dtype=np.intp)
+        starts = self.used + np.cumsum(counts) - counts
+        self.records[self.used : self.used + counts.sum()] = np.concatenate(records)
+        self.used += int(counts.sum())
+        self.starts[slots] = starts
+        self.counts[slots] = counts
+        self.alive[slots] = True
+        self._refresh(slots)
+        return [self._handle(slot) for slot in slots.tolist()]
+
+    def _next_slot(self):
+        self.slots += 1
+        return self.slots - 1
+
+    def remove(self, handle):
+        slot = self.slot_of(handle)
+        self.alive[slot] = False
+        self.generations[slot] += 1
+        self.garbage += int(self.counts[slot])
+        self.counts[slot] = 0
+        self.free.append(slot)
+        if self.garbage > self.compact_ratio * self.used:
+            self.compact()
+
+    def compact(self):
+        # moves the live records together in slot order, handles stay valid
+        live = np.flatnonzero(self.alive[: self.slots])
+        rows, _, _ = ragged_rows(self.starts[live], self.counts[live])
+        self.records[: len(rows)] = self.records[rows]
+        counts = self.counts[live]
+        self.starts[live] = np.cumsum(counts) - counts
+        self.used = len(rows)
+        self.garbage = 0
+
+    def _refresh(self, slots):
+        # centers and aabbs of the given slots from their records
+        counts = self.counts[slots]
+        rows, owner, _ = ragged_rows(self.starts[slots], counts)
+        xy = self.records[rows, :2]
+        firsts = np.cumsum(counts) - counts
+        self.aabbs[slots, :2] = np.minimum.reduceat(xy, firsts)
+        self.aabbs[slots, 2:] = np.maximum.reduceat(xy, firsts)
+        for c in (0, 1):
+            self.centers[slots, c] = np.bincount(owner, xy[:, c], len(slots)) / counts
+
+    def translate_many(self, handles, translations):
+        slots = self._slots(handles)
+        translations = np.asarray(translations, dtype=self.dtype).reshape(-1, 2)
+        rows, owner, _ = ragged_rows(self.starts[slots], self.counts[slots])
+        self.records[rows, :2] += translations[owner]
+        self.centers[slots] += translations
+        self.aabbs[slots] += np.tile(translations, 2)
+
+    def rotate_many(self, handles, angles, points=None):
+        # rotates around points, every body's center by default, with the
+        # same convention as rotate_around
+        slots = self._slots(handles)
+        angles = np.asarray(angles, dtype=float)
+        points = (
+            self.centers[slots]
+            if points is None
+            else np.asarray(points, dtype=self.dtype).reshape(-1, 2)
+        )
+        rows, owner, _ = ragged_rows(self.starts[slots], self.counts[slots])
+        c, s = np.cos(angles)[owner], np.sin(angles)[owner]
+        # row vectors times rotation_matrix_2d, [[c, -s], [s, c]]
+        p = self.records[rows, :2] - points[owner]
+        n = self.records[rows, 2:]
+        self.records[rows, 0] = p[:, 0] * c + p[:, 1] * s + points[owner, 0]
+        self.records[rows, 1] = p[:, 1] * c - p[:, 0] * s + points[owner, 1]
+        self.records[rows, 2] = n[:, 0] * c + n[:, 1] * s
+        self.records[rows, 3] = n[:, 1] * c - n[:, 0] * s
+        self._refresh(slots)
+
+    def handles(self):
+        live = np.flatnonzero(self.alive[: self.slots])
+        return [self._handle(slot) for slot in live.tolist()]
+
+    def _handle(self, slot):
+        return PolygonHandle(self, slot, int(self.generations[slot]))
+
+    def handle(self, slot):
+        if not self.alive[slot]:
+            raise KeyError(slot)
+        return self._handle(slot)
+
+    def polygon(self, handle):
+        # a standalone SimpleConvexPolygon with the body's current shape
+        points = np.array(self.records_of(handle)[:, :2], dtype=float)
+        n = len(points)
+        return SimpleConvexPolygon(points, [(i, (i + 1) % n) for i in range(n)])
+
+    def query(self, aabb):
+        # live slots whose aabbs overlap aabb
+        x1, y1, x2, y2 = aabb
+        boxes = self.aabbs[: self.slots]
+        hit = (
+            self.alive[: self.slots]
+            & (boxes[:, 0] <= x2)
+            & (boxes[:, 2] >= x1)
+            & (boxes[:, 1] <= y2)
+            & (boxes[:, 3] >= y1)
+        )
+        return np.flatnonzero(hit)
+
+    def bodies_at(self, point):
+        # live slots containing point, edges included
+        px, py = point
+        candidates = self.query((px, py, px, py))
+        if not len(candidates):
+            return candidates
+        rows, owner, _ = ragged_rows(self.starts[candidates], self.counts[candidates])
+        x, y, nx, ny = self.records[rows].T
+        outside = (px - x) * nx + (py - y) * ny > 0
+        return candidates[np.bincount(owner, outside, len(candidates)) == 0]
+
+    def pack(self, slots):
+        slots = np.asarray(slots, dtype=np.intp)
+        return pack_records(self.records, self.starts[slots], self.counts[slots])
+
+    def candidate_pairs(self):
+        # (slots1, slots2) of every live pair with overlapping aabbs
+        live = np.flatnonzero(self.alive[: self.slots])
+        i, j = aabb_pairs(self.aabbs[live])
+        return live[i], live[j]
+
+    def collide(self, slots1, slots2, buffer=None):
+        # SAT_batch over slot pairs, only the bodies involved get packed
+        slots1 = np.asarray(slots1, dtype=np.intp)
+        slots2 = np.asarray(slots2, dtype=np.intp)
+        involved, inverse = np.unique(
+            np.concatenate((slots1, slots2)), return_inverse=True
+        )
+        return SimpleConvexPolygonCollisions.SAT_batch(
+            self.pack(involved), inverse[: len(slots1)], inverse[len(slots1) :], buffer
+        )
+
+    def step(self):
+        # (slots1, slots2, normals, depths) of every colliding pair
+        slots1, slots2 = self.candidate_pairs()
+        hits, normals, depths = self.collide(slots1, slots2)
+        return slots1[hits], slots2[hits], normals[hits], depths[hits]
+
+    @property
+    def nbytes(self):
+        # memory held by the arrays, spare capacity included
+        arrays = (self.records, self.starts, self.counts, self.centers, self.aabbs)
+        arrays += (self.alive, self.generations)
+        return sum(a.nbytes for a in arrays)
+
+    def __len__(self):
+        return int(self.alive[: self.slots].sum())
+
+    def __contains__(self, handle):
+        return handle.store is self and handle.alive
+
+    def __repr__(self):
+        return (
+            f"<PolygonStore bodies={len(self)} records={self.used} "
+            f"garbage={self.garbage} dtype={self.dtype}>"
+        )
@@ -0,0 +1,102 @@
+# headless simulation state: the bodies, a broad phase index over them and
+# the dispatcher running the narrow phase. nothing here draws
+
+from . import np
+from ._types import transform_many
+from .broadphase import DynamicAABBTree
+from .dispatch import dispatcher as shared_dispatcher, default_dispatcher
+from .queries import bodies_at
+from .profiling import profiler
+
+
+class World:
+    def __init__(self, broad_phase=None, dispatcher=None, contact_cache=None) -> None:
+        # any of core.broadphase's indices, they share the same interface
+        self.broad_phase = broad_phase if broad_phase is not None else DynamicAABBTree()
+        # a ContactCache keeps polygon contacts across steps, without an
+        # explicit dispatcher one using it is built
+        self.contact_cache = contact_cache
+        if dispatcher is None:
+            if contact_cache is None:
+                dispatcher = shared_dispatcher
+            else:
+                dispatcher = default_dispatcher(contact_cache)
+        self.dispatcher = dispatcher
+        # insertion ordered, the values are unused
+        self.bodies = {}
+        self.steps = 0
+
+    def add(self, body):
+        self.bodies[body] = None
+        self.broad_phase.insert(body)
+        return body
+
+    def extend(self, bodies):
+        for body in bodies:
+            self.add(body)
+
+    def remove(self, body):
+        del self.bodies[body]
+        self.broad_phase.remove(body)
+        if self.contact_cache is not None:
+            self.contact_cache.forget(body)
+
+    def move(self, body, tvec=None, angle=0.0, point=None):
+        # translates and then rotates around point, the body's center by
+        # default. bodies changed from outside have to be passed to update
+        if tvec is not None:
+            self.broad_phase.translate(body, np.asarray(tvec, dtype=float))
+        if angle:
+            pivot = body.center if point is None else point
+            self.broad_phase.rotate(body, angle, pivot)
+
+    def move_many(self, bodies, translations=None, angles=None, points=None):
+        # the batch version of move, see transform_many
+        bodies = list(bodies)
+        transform_many(bodies, translations, angles, points)
+        update = self.broad_phase.update
+        for body in bodies:
+            update(body)
+
+    def update(self, body=None):
+        # refreshes the index after bodies moved without going through move
+        for b in self.bodies if body is None else (body,):
+            self.broad_phase.update(b)
+
+    def pairs(self):
+        with profiler.phase("broad_phase"):
+            return list(self.broad_phase.candidate_pairs())
+
+    def step(self):
+        # (body1, body2, collision) for every colliding pair, in the broad
+        # phase's pair order
+        pairs = self.pairs()
+        collisions = self.dispatcher.collide_pairs(pairs)
+        self.steps += 1
+        if self.contact_cache is not None:
+            self.contact_cache.tick()
+        return [(b1, b2, c) for (b1, b2), c in zip(pairs, collisions) if c]
+
+    def query_point(self, point):
+        return bodies_at(self.broad_phase, point)
+
+    def query(self, aabb):
+        return self.broad_phase.query(aabb)
+
+    def clear(self):
+        self.bodies.clear()
+        self.broad_phase.clear()
+        if self.contact_cache is not None:
+            self.contact_cache.clear()
+
+    def __len__(self):
+        return len(self.bodies)
+
+    def __contains__(self, body):
+        return body in self.bodies
+
+    def __iter__(self):
+        return iter(self.bodies)
+
+    def __repr__(self):
+        return f"<World bodies={len(self.bodies)} broad_phase={self.broad_phase!r}>"
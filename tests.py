@@ -4,14 +4,16 @@ from core._types import *
 from core import logger, console_handler
 from core.lines import *
 from core.polygons import *
-from numpy.random import random_sample, randint
+from core.broadphase import SpatialHashGrid
+from core.world import World
+from core.scenes import SEED, scene_rng, random_lines, random_polygons, random_circles
 from logging import DEBUG
-import itertools
 
 console_handler.setLevel(DEBUG)
 
 
 CIRCLE_RADIUS = 5
+GRID_CELL_SIZE = 200
 
 
 colors = {
@@ -33,11 +35,6 @@ colors = {
 }
 
 
-def swap(t: tuple):
-    t = (t[1], t[0])
-    return t
-
-
 def cartesian_to_pygame_screen(cartesian_point, sw, sh):
     x, y = cartesian_point
     sx = int(sw / 2 + x)
@@ -71,6 +68,12 @@ def draw_polygon(
     pygame.draw.polygon(pysurface, color, list(adapted), width=3)
 
 
+def draw_circle(circle: Circle, pysurface: pygame.Surface, color=colors["white"]):
+    w, h = pysurface.get_size()
+    center = cartesian_to_pygame_screen(circle.center, w, h)
+    pygame.draw.circle(pysurface, color, center, int(circle.radius), width=3)
+
+
 def draw_line(l: Line, pysurface: pygame.Surface, color, axis=False):
     ctps = cartesian_to_pygame_screen
     w, h = pysurface.get_size()
@@ -116,47 +119,27 @@ class TestFrame:
 
 
 class TestController:
-    collision_functions = {
-        (SimpleConvexPolygon, Line): SimpleConvexPolygonCollisions.polygon_line,
-        (SimpleConvexPolygon, LineSegment): SimpleConvexPolygonCollisions.polygon_line,
-        (
-            SimpleConvexPolygon,
-            SimpleConvexPolygon,
-        ): SimpleConvexPolygonCollisions.polygon_polygon_SAT,
-        (LineSegment, Line): LineCollisions.segment_line,
-        (LineSegment, LineSegment): LineCollisions.segment_segment,
-        (Line, Line): LineCollisions.line_line,
-        (Circle, Line): None,  # Placeholder as Circle handling isn't implemented
-        (Circle, LineSegment): None,  # Placeholder as Circle handling isn't implemented
-        (
-            Circle,
-            SimpleConvexPolygon,
-        ): None,  # Placeholder as Circle handling isn't implemented
-        (Circle, Circle): None,  # Placeholder as Circle handling isn't implemented
-    }
-
     def random_lines(self, k):
-        lines = []
-        for _ in range(k):
-            direction = random_sample(2)
-            point = random_sample(2) * (self.testframe.size[0] / 2)
-            lines.append(Line(direction=direction, point=point))
-        return lines
+        return random_lines(k, self.testframe.size[0] / 2, self.rng)
 
     def random_polygons(self, k):
-        polygons = []
-        for _ in range(k):
-            poly = SimpleConvexPolygon.generate_n_polygon(
-                n=randint(3, 6),
-                r=randint(40, 100),
-                center=random_sample(2) * (self.testframe.size[0] / 2),
-            )
-            polygons.append(poly)
-        return polygons
-
-    def __init__(self, structures, testframe: TestFrame) -> None:
-        self.structures = structures
+        extent = self.testframe.size[0] / 2
+        return random_polygons(k, extent, self.rng, sides=(3, 6), radius=(40, 100))
+
+    def random_circles(self, k):
+        extent = self.testframe.size[0] / 2
+        return random_circles(k, extent, self.rng, radius=(20, 60))
+
+    def __init__(
+        self, structures, testframe: TestFrame, broad_phase=None, seed=SEED
+    ) -> None:
+        # the simulation lives in a World, this class only draws it and
+        # turns mouse input into moves
+        self.world = World(broad_phase or SpatialHashGrid(GRID_CELL_SIZE))
+        self.world.extend(structures)
         self.testframe = testframe
+        # seeded, the same scene comes up on every run
+        self.rng = scene_rng(seed)
         self.drawers = {
             np.ndarray: lambda p: draw_point(p, self.testframe.screen),
             Line: lambda line: draw_line(
@@ -166,6 +149,9 @@ class TestController:
             SimpleConvexPolygon: lambda poly: draw_polygon(
                 poly, self.testframe.screen, colors["red"]
             ),
+            Circle: lambda circle: draw_circle(
+                circle, self.testframe.screen, colors["red"]
+            ),
         }
 
     def draw_collision(self, collision: Collision):
@@ -189,20 +175,17 @@ class TestController:
                     pd(p)
                 
 
+    @property
+    def structures(self):
+        return list(self.world)
+
     def collision_testing(self):
-        for comb in itertools.combinations(self.structures, 2):
-            args = tuple(map(type, comb))
-            if args not in self.collision_functions:
-                comb = swap(comb)
-                args = swap(args)
-            func = self.collision_functions[args]
-            c = func(*comb)
-            if c:
-                # logger.debug(f"collision found for {args}!")
-                self.draw_collision(c)
+        for _, _, c in self.world.step():
+            # logger.debug(f"collision found: {c}")
+            self.draw_collision(c)
 
     def draw_structures(self):
-        for s in self.structures:
+        for s in self.world:
             func = self.drawers[type(s)]
             func(s)
 
@@ -214,16 +197,16 @@ class TestController:
     def handle_input(self, mstate, kstate):
         mpos, pressed = mstate
         if pressed[0]:
-            for s in self.structures:
-                t = type(s)
-                if t is SimpleConvexPolygon:
-                    if SimpleConvexPolygonCollisions.polygon_point(s, mpos):
-                        s.translate(mpos - s.center)
-                        return
-                elif t is Line:
+            # the broad phase hands out the bodies whose boxes hold the cursor,
+            # query_point keeps those whose shape contains it
+            for s in self.world.query_point(mpos):
+                self.world.move(s, mpos - s.center)
+                return
+            for s in self.world:
+                if type(s) is Line:
                     c = LineCollisions.line_point(s, mpos, atol=50)
                     if c:
-                        s.translate(mpos - s.known_point)
+                        self.world.move(s, mpos - s.known_point)
                         return
 
     def mainloop(self, framerate):
@@ -252,8 +235,9 @@ def main():
         [],
         mytestframe,
     )
-    mycontroller.structures += mycontroller.random_polygons(4)
-    mycontroller.structures += mycontroller.random_lines(3)
+    mycontroller.world.extend(mycontroller.random_polygons(4))
+    mycontroller.world.extend(mycontroller.random_lines(3))
+    mycontroller.world.extend(mycontroller.random_circles(2))
     
 
     mycontroller.mainloop(framerate=60)